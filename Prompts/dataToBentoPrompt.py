@@ -50,8 +50,86 @@ class DataToBentoPrompt:
                 "interconnectedNarrative": "Each bento should feel connected to the overall story while standing alone as valuable content."
             }},
 
+            "sectionTagging": "Set the 'section' field of every bento to the part of userData it is built from: 'profile' (fullName, title, summary), 'skills', 'experiences', 'projects' or 'educations'. Use 'overview' only for cards that combine several parts, such as career progression or personality insights.",
+
             "userData": {json.dumps(userData.model_dump(mode="json"))},
 
             "creativeChallenge": "Transform this resume data into a digital experience that would impress hiring managers, clients, and peers. Create bentos that not only inform but inspire confidence in this professional's abilities and potential."
         }}
-        """
\ No newline at end of file
+        """
+
+
+SECTION_FIELDS = {
+    "profile": ("fullName", "title", "summary"),
+    "skills": ("skills",),
+    "experiences": ("experiences",),
+    "projects": ("projects",),
+    "educations": ("educations",),
+}
+
+
+def changedSections(previous: ResumeData, current: ResumeData) -> set:
+    """Names of the bento sections whose underlying profile fields differ."""
+    before = previous.model_dump(mode="json")
+    after = current.model_dump(mode="json")
+    return {
+        section
+        for section, fields in SECTION_FIELDS.items()
+        if any(before.get(field) != after.get(field) for field in fields)
+    }
+
+
+def mergeSectionCards(elements: list, fresh: list, changed: set) -> list:
+    """
+    Replace each changed section's cards in place, at the position of its first old card.
+
+    A changed section the model returned no (tagged) cards for keeps its previous
+    cards, so an incomplete response never wipes part of a saved website. Cards for
+    sections the website did not have yet are appended.
+    """
+    by_section = {}
+    for card in fresh:
+        by_section.setdefault(card["section"], []).append(card)
+
+    missing = changed - by_section.keys()
+    if missing:
+        print(f"bento refresh returned no cards for {sorted(missing)}, keeping the saved ones")
+    replaced = changed & by_section.keys()
+
+    merged = []
+    for element in elements:
+        section = element.get("section")
+        if section in replaced:
+            merged.extend(by_section.pop(section, []))
+        else:
+            merged.append(element)
+    for cards in by_section.values():
+        merged.extend(cards)
+    return merged
+
+
+class SectionBentoPrompt:
+    """Prompt that regenerates only the bento cards of the given profile sections."""
+
+    def __init__(self, userData: ResumeData, sections: set, previousCards: list):
+        data = userData.model_dump(mode="json")
+        sectionNames = ", ".join(sorted(sections))
+        sectionData = {
+            section: {field: data[field] for field in SECTION_FIELDS[section]}
+            for section in sorted(sections)
+        }
+        self.prompt = f"""
+        {{
+            "instruction": "Part of the user's profile changed. Rebuild the Bento-style portfolio cards for the changed sections only, keeping the same confident, specific, story-driven tone as a full portfolio. Return only cards for these sections: {sectionNames}.",
+
+            "rules": {{
+                "sectionTagging": "Set 'section' on every card to the section it belongs to. Never return cards for other sections.",
+                "previousCards": "previousCards were built from the old data. Keep their layout, size, accent and overall count where the data still supports them, update their content, and add or remove cards only where the data itself was added or removed.",
+                "innerBentos": "Use innerBentos for groupings, timelines and feature highlights as in a full portfolio."
+            }},
+
+            "changedData": {json.dumps(sectionData)},
+
+            "previousCards": {json.dumps(previousCards)}
+        }}
+        """
@@ -0,0 +1,74 @@
+# LaTeX resume template rendered by services/ResumeTemplateRenderer.py
+#
+# Jinja2 with LaTeX-friendly delimiters: ((* block *)), ((( variable ))), ((# comment #)).
+# Every variable is LaTeX-escaped on output, so user data can never inject markup.
+# The preamble is fixed, which also lets every rendered resume reuse one precompiled format.
+
+resume_latex_template = r"""
+\documentclass[11pt,a4paper]{article}
+\usepackage[utf8]{inputenc}
+\usepackage[T1]{fontenc}
+\usepackage{lmodern}
+\usepackage[margin=0.7in]{geometry}
+\usepackage{xcolor}
+\usepackage{enumitem}
+\usepackage{titlesec}
+\usepackage[hidelinks]{hyperref}
+
+\definecolor{accent}{HTML}{1F4E79}
+\titleformat{\section}{\large\bfseries\color{accent}}{}{0em}{}[\titlerule]
+\titlespacing*{\section}{0pt}{10pt}{6pt}
+\setlist[itemize]{leftmargin=1.2em,topsep=2pt,itemsep=1pt,parsep=0pt}
+\setlength{\parindent}{0pt}
+\pagestyle{empty}
+
+\newcommand{\resumeentry}[3]{%
+  \textbf{#1}\hfill{\small\color{gray}#3}\par
+  {\itshape #2}\par\smallskip}
+
+\begin{document}
+
+\begin{center}
+  {\LARGE\bfseries ((( data.fullName )))}\par\smallskip
+  {\large\color{accent} ((( data.title )))}
+\end{center}
+
+((* if data.summary *))
+\section*{Summary}
+((( data.summary )))
+((* endif *))
+
+((* if data.experiences *))
+\section*{Experience}
+((* for experience in data.experiences *))
+\resumeentry{((( experience.role )))}{((( experience.company )))}{((( experience.years )))}
+((( experience.summary )))
+((* if not loop.last *))\medskip((* endif *))
+
+((* endfor *))
+((* endif *))
+
+((* if data.projects *))
+\section*{Projects}
+((* for project in data.projects *))
+\resumeentry{((( project.name )))}{((( project.techstack | join(", ") )))}{((( project.year )))}
+((( project.summary )))
+((* if not loop.last *))\medskip((* endif *))
+
+((* endfor *))
+((* endif *))
+
+((* if data.educations *))
+\section*{Education}
+((* for education in data.educations *))
+\resumeentry{((( education.degree )))}{((( education.institution )))}{((( education.year )))}
+((* endfor *))
+((* endif *))
+
+((* if data.skills *))
+\section*{Skills}
+((( data.skills | join(" · ") )))
+((* endif *))
+
+\end{document}
+"""
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+class AuthUser(BaseModel):
+    uid: str
+    email: Optional[str] = None
+    claims: Dict[str, Any]
@@ -1,35 +1,167 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import io
+from fastapi.responses import FileResponse, Response, StreamingResponse, JSONResponse
+import json
+from sse_starlette.sse import EventSourceResponse
 from services.DocsToInfoService import PDFtoInfo
 from tempfile import gettempdir
-import uuid
-from methods.firebaseMethods import get_current_user_uid, get_current_user_email ,addSocialGreeting, addSocialLinkForUser, uploadIcon, addProfileForUser, getProfileOfUser, saveTexFile, getSavedTexContent, mapIdToEmail, getIdFromEmail, deleteSocialLink, getPdfFromEmail, saveBentoForUser, getBentoWebsite
+from methods.firebaseMethods import get_current_user_uid, get_current_user_email, token_verifier, blob_storage, closeHttpSession,addSocialGreeting, addSocialLinkForUser, uploadIcon, addProfileForUser, getProfileOfUser, saveTexFile, getSavedTexContent, mapIdToEmail, getIdFromEmail, deleteSocialLink, getPdfFromEmail, saveBentoForUser, getBentoWebsite
 from interfaces.social_link_greeting import SocialLinkGreeting
 from interfaces.social_link import SocialLink
 from interfaces.resumeData import ResumeData
-from datetime import datetime, timezone
-from services.LatexToPDF import TexToPdfConverter
+from services.LatexToPDF import TexToPdfConverter, PdfResult
 from services.ResumeDataToLatex import ResumeDataToLatex
+from services.ResumeTemplateRenderer import resume_template_renderer
+from typing import Literal
 from pathlib import Path
 from services.UserBentoGenerator import UserBentoGenerator
+from services.BentoJobs import bento_jobs
+from services.GenerationDebugSink import generation_debug_sink
+from services.IconImagePipeline import icon_pipeline
+from services.PdfTextExtractor import pdf_text_extractor
+from services.UploadIngestion import UploadLimitMiddleware, ingest_upload
+from services.config import env_float, env_int
+from services.LatexCompilePool import compile_pool
+from services.LatexEngines import latex_engines
+from methods.readCache import read_caches
+from contextlib import asynccontextmanager
+import httpx
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await latex_engines.discover()
+    token_verifier.start()
 
+    # Model clients are built once and shared by every request; the pooled HTTP client
+    # keeps TLS sessions to the model endpoint alive between calls.
+    llm_http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=env_int("LLM_HTTP_MAX_CONNECTIONS", 32),
+            max_keepalive_connections=env_int("LLM_HTTP_MAX_KEEPALIVE", 16),
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(env_float("LLM_HTTP_TIMEOUT", 180), connect=10),
+    )
+    app.state.pdf_to_info = PDFtoInfo()
+    app.state.resume_to_latex = ResumeDataToLatex()
+    app.state.bento_generator = UserBentoGenerator(http_client=llm_http_client)
+    try:
+        yield
+    finally:
+        await bento_jobs.shutdown()
+        await app.state.bento_generator.aclose()
+        await llm_http_client.aclose()
+        await token_verifier.stop()
+        await blob_storage.close()
+        await closeHttpSession()
+        icon_pipeline.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+TEX_UPLOAD_MAX_BYTES = env_int("TEX_UPLOAD_MAX_BYTES", 1024 * 1024)
+upload_limits = {
+    "/scanpdf": pdf_text_extractor.max_bytes,
+    "/saveResume": TEX_UPLOAD_MAX_BYTES,
+    "/convert-tex": TEX_UPLOAD_MAX_BYTES,
+    "/uploadIconAndGetURL": icon_pipeline.max_bytes,
+}
+
+# Added before CORS so that early 413 responses still carry CORS headers
+app.add_middleware(UploadLimitMiddleware, limits=upload_limits)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://smil-thakur.github.io",],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Latex-Passes", "ETag"],
 )
 
+def get_pdf_to_info(request: Request) -> PDFtoInfo:
+    return request.app.state.pdf_to_info
+
+def get_resume_to_latex(request: Request) -> ResumeDataToLatex:
+    return request.app.state.resume_to_latex
+
+def get_bento_generator(request: Request) -> UserBentoGenerator:
+    return request.app.state.bento_generator
+
+def pdf_response(request: Request, result: PdfResult, headers: dict = None) -> Response:
+    """
+    Serve a PDF with ETag revalidation and Range support: small PDFs straight from
+    memory, large ones from their cache file.
+    """
+    headers = {
+        **(headers or {}),
+        "ETag": f'"{result.cache_key}"',
+        "Cache-Control": "public, no-cache",
+        "X-Latex-Passes": str(result.passes),
+    }
+    if request.method == "GET":
+        if_none_match = request.headers.get("if-none-match", "")
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if headers["ETag"] in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    if result.data is None and result.path is not None:
+        return FileResponse(result.path, media_type="application/pdf", headers=headers)
+    return bytes_range_response(request, result.pdf, "application/pdf", headers)
+
+
+def bytes_range_response(request: Request, data: bytes, media_type: str, headers: dict) -> Response:
+    """
+    Serve in-memory bytes with single-range support, matching what FileResponse does
+    for files. Multi-range and malformed Range headers get the full body.
+    """
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if request.method != "GET" or not range_header or (if_range is not None and if_range != headers.get("ETag")):
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    size = len(data)
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return Response(content=data, media_type=media_type, headers=headers)
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1 if int(last) > 0 else -1
+    except ValueError:
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    if start < 0 or start > end or start >= size:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    return Response(
+        content=data[start:end + 1],
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+    )
+
 @app.get("/")
 async def read_root():
     return {"message":"hello world"}
 
+@app.get("/health/compile")
+async def compile_health():
+    return compile_pool.stats()
+
+@app.get("/health/cache")
+async def cache_health():
+    return {name: cache.stats() for name, cache in read_caches.items()}
+
+@app.get("/health/latex")
+async def latex_health():
+    engines = latex_engines.status()
+    return {"ok": any(info["available"] for info in engines.values()), "engines": engines}
+
 @app.post("/addSocialGreeting")
 async def getUserId(greeting:SocialLinkGreeting,uid: str =  Depends(get_current_user_uid)):
     try:
@@ -49,12 +181,10 @@ async def addSocialLink(socialLink:SocialLink, uid: str = Depends(get_current_us
 @app.post("/uploadIconAndGetURL")
 async def uploadIconAndGetURL(uid: str = Depends(get_current_user_uid), file:UploadFile = File(...)):
     try:
-        file_ext = file.filename.split('.')[-1]
-        unique_name = f"user-icons/{uid}/{datetime.now(timezone.utc).timestamp()}_{uuid.uuid4()}.{file_ext}"
-        file_data = await file.read()
-        file_content_type = file.content_type
-        url = await uploadIcon(file_data,file_content_type,unique_name)
-        return {"url": url}
+        upload = await ingest_upload(file, upload_limits["/uploadIconAndGetURL"])
+        return await uploadIcon(upload.file, upload.digest)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
     
@@ -64,10 +194,11 @@ async def saveResumeTex(uid: str = Depends(get_current_user_uid),file:UploadFile
         file_ext = file.filename.split(".")[-1]
         if(file_ext != "tex"):
             raise HTTPException(status_code=500,detail="wrong file extension, file should be tex")
-        file_data = await file.read()
-        file_content_type = file.content_type
-        url = await saveTexFile(uid,file_data,file_content_type)
+        upload = await ingest_upload(file, upload_limits["/saveResume"])
+        url = await saveTexFile(uid,upload.file,upload.content_type)
         return url
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
     
@@ -81,11 +212,14 @@ async def getTexContent(uid: str = Depends(get_current_user_uid)):
     
     
 @app.post("/scanpdf")
-async def scanPDF(uid: str = Depends(get_current_user_uid),file:UploadFile = File(...)):
+async def scanPDF(uid: str = Depends(get_current_user_uid),file:UploadFile = File(...),pDFtoInfo: PDFtoInfo = Depends(get_pdf_to_info)):
     try:
-        pDFtoInfo = PDFtoInfo()
-        data =  await pDFtoInfo.analysePDF(file.file)
-        return data
+        upload = await ingest_upload(file, upload_limits["/scanpdf"])
+        data, timings =  await pDFtoInfo.analysePDF(upload.file, uid, digest=upload.digest)
+        server_timing = ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
+        return JSONResponse(content=data, headers={"Server-Timing": server_timing})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500,detail=str(e))
     
@@ -109,34 +243,31 @@ async def getUserProfile(uid: str= Depends(get_current_user_uid)):
 
         
 @app.post("/convert-tex")
-async def convert_tex(file: UploadFile = File(...)):
+async def convert_tex(request: Request, file: UploadFile = File(...)):
     try:
         converter = TexToPdfConverter()   
-        pdf_bytes = await converter.tex_to_pdf_bytes(file)
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
-            media_type="application/pdf",
-        )
+        upload = await ingest_upload(file, upload_limits["/convert-tex"])
+        result = await converter.convert(upload)
+        return pdf_response(request, result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/getTexFromProfile")
-async def getTextFromProfile(file:ResumeData,uid: str = Depends(get_current_user_uid)):
-    converter = ResumeDataToLatex()
+async def getTextFromProfile(file:ResumeData,regenerate: bool = False,mode: Literal["llm", "template"] = "llm",uid: str = Depends(get_current_user_uid),converter: ResumeDataToLatex = Depends(get_resume_to_latex)):
     try:
-        return {"latex": await converter.get_latex(file)}
+        if mode == "template":
+            return {"latex": resume_template_renderer.render(file)}
+        return {"latex": await converter.get_latex(file, regenerate=regenerate)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/getPdfFromEmail")
-async def getPdfFromEmailEndpoint(email: str):
-    try:
-        pdf_bytes = await getPdfFromEmail(email)
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=resume_{email}.pdf"}
-        )
+async def getPdfFromEmailEndpoint(request: Request, email: str):
+    try:
+        result = await getPdfFromEmail(email)
+        return pdf_response(request, result, {"Content-Disposition": f"attachment; filename=resume_{email}.pdf"})
     except HTTPException:
         raise
     except Exception as e:
@@ -144,6 +275,7 @@ async def getPdfFromEmailEndpoint(email: str):
         
 @app.post("/mapEmailToId")
 async def mapEmailToId(uid: str= Depends(get_current_user_uid),email: str = Depends(get_current_user_email)):
+    # Both dependencies share get_current_user, which FastAPI resolves once per request
     try:
         await mapIdToEmail(uid,email)
     except Exception as e:
@@ -164,14 +296,56 @@ async def deleteSocialLinkAPI(sid:str,uid: str=Depends(get_current_user_uid)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/bento")
-async def get_bento(uid: str= Depends(get_current_user_uid)):
+async def get_bento(uid: str= Depends(get_current_user_uid),portfolio_generator: UserBentoGenerator = Depends(get_bento_generator)):
     try:
-        portfolio_generator = UserBentoGenerator()
         website_data = await portfolio_generator.get_bento(uid)
         return website_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/bento/refresh")
+async def refresh_bento(uid: str = Depends(get_current_user_uid), portfolio_generator: UserBentoGenerator = Depends(get_bento_generator)):
+    try:
+        return await portfolio_generator.refresh_bento(uid)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/bento/stream")
+async def stream_bento(uid: str = Depends(get_current_user_uid), portfolio_generator: UserBentoGenerator = Depends(get_bento_generator)):
+    async def ndjson():
+        count = 0
+        try:
+            async for card in portfolio_generator.stream_bento(uid):
+                count += 1
+                yield json.dumps({"type": "card", "card": card}) + "\n"
+            yield json.dumps({"type": "done", "count": count}) + "\n"
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.post("/bento/jobs", status_code=202)
+async def create_bento_job(regenerate: bool = False, uid: str = Depends(get_current_user_uid), portfolio_generator: UserBentoGenerator = Depends(get_bento_generator)):
+    input_key = await portfolio_generator.input_key(uid)
+    job = bento_jobs.submit(uid, portfolio_generator, input_key, regenerate=regenerate)
+    return {"id": job.id, "status": job.status}
+
+@app.get("/bento/jobs/{job_id}")
+async def get_bento_job(job_id: str, uid: str = Depends(get_current_user_uid)):
+    return bento_jobs.get(job_id, uid).snapshot()
+
+@app.get("/bento/jobs/{job_id}/events")
+async def stream_bento_job(job_id: str, uid: str = Depends(get_current_user_uid)):
+    job = bento_jobs.get(job_id, uid)
+    return EventSourceResponse(bento_jobs.events(job))
+
+@app.get("/debug/generations")
+async def recent_generations(uid: str = Depends(get_current_user_uid)):
+    if not generation_debug_sink.enabled:
+        raise HTTPException(status_code=404, detail="Generation capture is disabled")
+    return generation_debug_sink.recent(uid)
+
 @app.post("/saveBento")
 async def save_bento(website_data: dict, uid: str = Depends(get_current_user_uid)):
     try:
@@ -0,0 +1,22 @@
+import hashlib
+from typing import Any, Optional
+
+
+def normalizeEmail(email: str) -> str:
+    return email.strip().lower()
+
+
+def emailIndexKey(email: str) -> str:
+    return hashlib.sha256(normalizeEmail(email).encode("utf-8")).hexdigest()
+
+
+def legacyUidFromSnapshot(doc_snapshot: Any, email: str) -> Optional[str]:
+    """
+    Read one email's uid from a field-masked snapshot of the legacy Maps/userIdAndEmail doc.
+
+    DocumentSnapshot.get raises KeyError for a field that is not in the map, so the
+    masked data is read as a dict instead; an unknown email yields None.
+    """
+    if not doc_snapshot.exists:
+        return None
+    return (doc_snapshot.to_dict() or {}).get(email) or None
@@ -1,15 +1,25 @@
-from fastapi import Request, HTTPException
-from firebase_admin import auth, credentials, initialize_app
+from fastapi import Request, HTTPException, Depends
+from firebase_admin import credentials, initialize_app
 from google.cloud import firestore as google_firestore
 from google.cloud import storage as google_storage
 from interfaces.social_link_greeting import SocialLinkGreeting
 from interfaces.social_link import SocialLink
 from interfaces.resumeData import ResumeData
+from methods.readCache import ReadCache
+from methods.emailIndex import normalizeEmail, emailIndexKey, legacyUidFromSnapshot
+from methods.tokenVerifier import FirebaseTokenVerifier
+from interfaces.authUser import AuthUser
+from services.BlobStorage import create_blob_storage
+from services.config import env_float
+from services.IconImagePipeline import icon_pipeline, IMMUTABLE_CACHE_CONTROL
 import aiohttp
 from google.oauth2 import service_account
 from dotenv import load_dotenv
 import os
 import sys
+import asyncio
+import time
+from typing import BinaryIO, Optional
 
 
 
@@ -77,32 +87,47 @@ initialize_app(cred,{
 firestore_client = google_firestore.AsyncClient(credentials=creds,project=creds.project_id)
 storage_client = google_storage.Client(credentials=creds,project=creds.project_id)
 bucket = storage_client.bucket("socially-91ef8.firebasestorage.app")
+blob_storage = create_blob_storage(bucket)
 
+# Read-through caches for the unauthenticated public read paths
+emailCache = ReadCache("emailToUid", maxsize=10000, ttl=env_float("EMAIL_CACHE_TTL", 600), negative_ttl=env_float("EMAIL_CACHE_NEGATIVE_TTL", 60))
+profileCache = ReadCache("profile", maxsize=2000, ttl=env_float("PROFILE_CACHE_TTL", 300))
+texContentCache = ReadCache("texContent", maxsize=1000, ttl=env_float("TEX_CONTENT_CACHE_TTL", 3600))
+bentoCache = ReadCache("bento", maxsize=2000, ttl=env_float("BENTO_CACHE_TTL", 300), negative_ttl=env_float("BENTO_CACHE_NEGATIVE_TTL", 30))
 
-async def get_current_user_uid(request: Request) -> str:
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
+
+def _runInBackground(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+token_verifier = FirebaseTokenVerifier(cred.project_id)
+
+
+async def get_current_user(request: Request) -> AuthUser:
     auth_header = request.headers.get("Authorization")
     if not auth_header:
         raise HTTPException(status_code=401, detail="Authorization header missing")
     id_token = auth_header
     try:
-        decoded_token = auth.verify_id_token(id_token)
-        uid = decoded_token["uid"]
-        return uid
+        decoded_token = await token_verifier.verify(id_token)
     except Exception as e:
         print(e)
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return AuthUser(uid=decoded_token["uid"], email=decoded_token.get("email"), claims=decoded_token)
+
+async def get_current_user_uid(user: AuthUser = Depends(get_current_user)) -> str:
+    return user.uid
     
-async def get_current_user_email(request: Request) -> str:
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    id_token = auth_header
-    try:
-        decoded_token = auth.verify_id_token(id_token)
-        email = decoded_token["email"]
-        return email
-    except Exception as e:
+async def get_current_user_email(user: AuthUser = Depends(get_current_user)) -> str:
+    if not user.email:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return user.email
     
 async def addSocialGreeting(id:str, body:SocialLinkGreeting):
     doc_ref = firestore_client.collection("User").document(id).collection("SocialLinkGreeting").document("greeting")
@@ -116,8 +141,12 @@ async def addSocialLinkForUser(id:str, body:SocialLink):
 async def addProfileForUser(id: str, body:ResumeData):
     doc_ref = firestore_client.collection("User").document(id).collection("Profile").document(id)
     await doc_ref.set(body.model_dump())
+    profileCache.invalidate(id)
     
 async def getProfileOfUser(id: str) -> ResumeData:
+    return await profileCache.get_or_load(id, lambda: _loadProfileOfUser(id))
+
+async def _loadProfileOfUser(id: str) -> ResumeData:
     doc_ref = firestore_client.collection("User").document(id).collection("Profile").document(id)
     doc_snapshot = await doc_ref.get()
 
@@ -126,68 +155,171 @@ async def getProfileOfUser(id: str) -> ResumeData:
         return ResumeData(**data)
     return None
     
-async def uploadIcon(filedata:bytes, fileContentType:str,unique_name:str)->str:
-    blob = bucket.blob(unique_name)
-    blob.upload_from_string(filedata, content_type=fileContentType)
-    blob.make_public()
-    return blob.public_url
+async def uploadIcon(file: BinaryIO, source_digest: str) -> dict:
+    digest = icon_pipeline.digest(source_digest)
+    names = {
+        image_format: {size: icon_pipeline.object_name(digest, size, image_format) for size in icon_pipeline.sizes}
+        for image_format, _ in icon_pipeline.formats
+    }
+    primary = names["WEBP"]
+    largest = icon_pipeline.sizes[-1]
+
+    # Identical uploads hash to the same objects; the largest variant is written last,
+    # so its presence means the whole set is already stored.
+    if not await blob_storage.exists(primary[largest]):
+        variants = await icon_pipeline.process(file)
+        variants.sort(key=lambda variant: variant.size == largest and variant.format == "WEBP")
+        await asyncio.gather(*(
+            blob_storage.upload(names[variant.format][variant.size], variant.data, variant.content_type,
+                                cache_control=IMMUTABLE_CACHE_CONTROL)
+            for variant in variants[:-1]
+        ))
+        last = variants[-1]
+        await blob_storage.upload(names[last.format][last.size], last.data, last.content_type,
+                                  cache_control=IMMUTABLE_CACHE_CONTROL)
+
+    response = {
+        "url": blob_storage.public_url(primary[largest]),
+        "variants": {str(size): blob_storage.public_url(name) for size, name in primary.items()},
+    }
+    if "AVIF" in names:
+        response["avif"] = {str(size): blob_storage.public_url(name) for size, name in names["AVIF"].items()}
+    return response
     
     
-async def saveTexFile(id: str, filedata: bytes, fileContentType: str) -> str:
+async def saveTexFile(id: str, file: BinaryIO, fileContentType: str) -> str:
     filename = f"user-texs/{id}/{uuid.uuid4()}_resume.tex"
-    folder_prefix = f"user-texs/{id}/"
-    blobs = bucket.list_blobs(prefix=folder_prefix)
-
-    for b in blobs:
-        if b.name.endswith(".tex"):
-            b.delete()
-
-    blob = bucket.blob(filename)
-
-    blob.upload_from_string(filedata, content_type=fileContentType)
-    blob.make_public()
+    stored = await blob_storage.upload(filename, file, fileContentType)
 
     doc_ref = firestore_client.collection("User").document(id).collection("Texs").document("resume")
     await doc_ref.set({
-        "url": blob.public_url,
-        "filename": filename
+        "url": stored.url,
+        "filename": filename,
+        "generation": stored.generation
     })
 
-    return blob.public_url
+    _runInBackground(_deleteStaleTexFiles(id, filename, stored.generation))
+
+    # PDFs are cached by content hash, so the previous upload's entry can no longer
+    # be hit; compile the new source now so the first public visitor gets a cache hit.
+    # The upload is read back from storage, which also fills texContentCache, because
+    # the request's file is closed as soon as this returns.
+    _runInBackground(_prewarmPdfCache(id))
+
+    return stored.url
+
+
+TEX_CLEANUP_GRACE_SECONDS = env_float("TEX_CLEANUP_GRACE_SECONDS", 300)
+
+
+async def _deleteStaleTexFiles(id: str, filename: str, generation: Optional[int]):
+    try:
+        # Another save may be between its upload and its Firestore write, so only objects
+        # older than ours and past the grace period are removed; the doc's current file
+        # is always kept. Anything skipped here is cleaned up by a later save.
+        keep = {filename}
+        doc_snapshot = await firestore_client.collection("User").document(id).collection("Texs").document("resume").get()
+        if doc_snapshot.exists:
+            keep.add((doc_snapshot.to_dict() or {}).get("filename"))
+
+        cutoff = time.time() - TEX_CLEANUP_GRACE_SECONDS
+        blobs = await blob_storage.list(f"user-texs/{id}/")
+        await blob_storage.delete([
+            blob.name for blob in blobs
+            if blob.name.endswith(".tex")
+            and blob.name not in keep
+            and blob.created < cutoff
+            and (generation is None or blob.generation is None or blob.generation < generation)
+        ])
+    except Exception as e:
+        print("stale tex cleanup failed:", e)
+
+
+async def _prewarmPdfCache(id: str):
+    try:
+        await _compileTexContent(await getSavedTexContent(id))
+    except Exception as e:
+        print("pdf cache prewarm failed:", e)
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def _httpSession() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    return _http_session
+
+
+async def closeHttpSession():
+    if _http_session is not None:
+        await _http_session.close()
 
-async def getTexURL(id:str)->str:
+
+async def getSavedTexContent(id: str) -> str:
     doc_ref = firestore_client.collection("User").document(id).collection("Texs").document("resume")
     doc_snapshot = await doc_ref.get()
-    if doc_snapshot.exists:
-        data = doc_snapshot.to_dict()
-        return data['url']
-    return None
+    if not doc_snapshot.exists:
+        raise Exception("No tex file found for this user")
+    data = doc_snapshot.to_dict()
+
+    filename = data.get("filename")
+    if not filename:
+        # Docs written before filenames were recorded only carry the public URL
+        async with _httpSession().get(data["url"]) as response:
+            if response.status != 200:
+                raise Exception(f"Failed to fetch file: {response.status}")
+            return await response.text()
+
+    # Object names are unique per save, so a cached copy is current unless the object
+    # was rewritten in place; the generation check (or a conditional download when the
+    # doc predates generations) catches that.
+    cached = texContentCache.get(filename)
+    if cached is not None and data.get("generation") is not None and cached[0] == data["generation"]:
+        return cached[1]
+
+    downloaded = await blob_storage.download(filename, if_generation_not_match=cached[0] if cached else None)
+    if downloaded is None:
+        return cached[1]
+    content = downloaded.data.decode("utf-8")
+    texContentCache.set(filename, (downloaded.generation, content))
+    return content
+
+
+# Email -> uid lookups use one document per normalized email hash, so a lookup reads a
+# single small document no matter how many users exist. The old single-document map is
+# only consulted for users that have not been backfilled yet (see migrateEmailIndex.py).
+EMAIL_INDEX_LEGACY_FALLBACK = os.getenv("EMAIL_INDEX_LEGACY_FALLBACK", "true").lower() != "false"
+
+
+def emailIndexRef(email: str):
+    return firestore_client.collection("EmailIndex").document(emailIndexKey(email))
 
 
-async def getSavedTexContent(id: str) -> str:
-    texURL = await getTexURL(id)  
-    
-    if texURL == None:
-        raise Exception("No tex file found for this user")  
-    else:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(texURL) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to fetch file: {response.status}")
-                return await response.text()
-        
 async def mapIdToEmail(id: str, email:str)-> str:
-    doc_ref = firestore_client.collection("Maps").document("userIdAndEmail")
-    await doc_ref.set({
-        email:id
-    },merge=True)
+    await emailIndexRef(email).set({
+        "uid": id,
+        "email": normalizeEmail(email)
+    })
+    emailCache.set(normalizeEmail(email), id)
     
 async def getIdFromEmail(email:str)->str:
-    doc_ref = firestore_client.collection("Maps").document("userIdAndEmail")
-    doc_snapshot = await doc_ref.get()
+    return await emailCache.get_or_load(normalizeEmail(email), lambda: _loadIdFromEmail(email))
+
+async def _loadIdFromEmail(email:str)->str:
+    doc_snapshot = await emailIndexRef(email).get()
     if doc_snapshot.exists:
-        data = doc_snapshot.to_dict()
-        return data.get(email)
+        return doc_snapshot.to_dict().get("uid")
+
+    if EMAIL_INDEX_LEGACY_FALLBACK:
+        # Fetch only this email's field from the legacy map and backfill the index
+        doc_ref = firestore_client.collection("Maps").document("userIdAndEmail")
+        field = firestore_client.field_path(email)
+        doc_snapshot = await doc_ref.get(field_paths=[field])
+        uid = legacyUidFromSnapshot(doc_snapshot, email)
+        if uid:
+            await mapIdToEmail(uid, email)
+            return uid
     return None
 
 
@@ -202,11 +334,36 @@ async def deleteSocialLink(uid:str,sid:str):
 
 async def saveBentoForUser(uid: str, website_data: dict):
     """Save website data for a user"""
-    doc_ref = firestore_client.collection("User").document(uid).collection("Bento").document("bento")
-    await doc_ref.set(website_data)
+    bento_ref = firestore_client.collection("User").document(uid).collection("Bento")
+    await bento_ref.document("bento").set(website_data)
+    bentoCache.invalidate(uid)
+
+    pending_snapshot = await bento_ref.document("pendingSource").get()
+    if pending_snapshot.exists:
+        await bento_ref.document("source").set(pending_snapshot.to_dict())
+        await bento_ref.document("pendingSource").delete()
 
 async def getBentoWebsite(uid: str) -> dict:
     """Get saved website data for a user"""
+    return await bentoCache.get_or_load(uid, lambda: _loadBentoWebsite(uid))
+
+async def saveBentoSourceForUser(uid: str, data: ResumeData, pending: bool = False):
+    """
+    Remember the profile a bento was generated from, for incremental refreshes.
+    A pending source belongs to a generated website the user has not saved yet and
+    becomes the source once saveBentoForUser stores a website.
+    """
+    doc_ref = firestore_client.collection("User").document(uid).collection("Bento").document("pendingSource" if pending else "source")
+    await doc_ref.set(data.model_dump())
+
+async def getBentoSourceOfUser(uid: str) -> ResumeData:
+    doc_ref = firestore_client.collection("User").document(uid).collection("Bento").document("source")
+    doc_snapshot = await doc_ref.get()
+    if doc_snapshot.exists:
+        return ResumeData(**doc_snapshot.to_dict())
+    return None
+
+async def _loadBentoWebsite(uid: str) -> dict:
     print("getting bento for",uid)
     doc_ref = firestore_client.collection("User").document(uid).collection("Bento").document("bento")
     doc_snapshot = await doc_ref.get()
@@ -215,7 +372,7 @@ async def getBentoWebsite(uid: str) -> dict:
         return doc_snapshot.to_dict()
     return None
 
-async def getPdfFromEmail(email: str) -> bytes:
+async def getPdfFromEmail(email: str):
 
     
     uid = await getIdFromEmail(email)
@@ -228,21 +385,10 @@ async def getPdfFromEmail(email: str) -> bytes:
         raise HTTPException(status_code=404, detail="No tex file found for this user")
     
     
+    return await _compileTexContent(tex_content)
+
+
+async def _compileTexContent(tex_content: str):
     from services.LatexToPDF import TexToPdfConverter
     converter = TexToPdfConverter()
-    
-    
-    import tempfile
-    import os
-    
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.tex', delete=False) as temp_file:
-        temp_file.write(tex_content)
-        temp_file_path = temp_file.name
-    
-    try:
-        
-        pdf_bytes = await converter.tex_to_pdf_bytes(temp_file_path)
-        return pdf_bytes
-    finally:
-        
-        os.unlink(temp_file_path)
\ No newline at end of file
+    return await converter.convert_source(tex_content.encode("utf-8"), "resume.tex")
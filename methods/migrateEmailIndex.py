@@ -0,0 +1,43 @@
+"""
+Backfill the per-email EmailIndex collection from the legacy Maps/userIdAndEmail document.
+
+Usage:
+    python -m methods.migrateEmailIndex [--dry-run]
+
+Safe to run repeatedly; existing index documents are overwritten with the same data.
+Once it has run, set EMAIL_INDEX_LEGACY_FALLBACK=false to stop consulting the old map.
+"""
+import argparse
+import asyncio
+from methods.firebaseMethods import firestore_client, emailIndexRef, normalizeEmail
+
+# Firestore caps a write batch at 500 operations
+BATCH_SIZE = 500
+
+
+async def migrate(dry_run: bool = False) -> int:
+    doc_snapshot = await firestore_client.collection("Maps").document("userIdAndEmail").get()
+    if not doc_snapshot.exists:
+        print("legacy map not found, nothing to migrate")
+        return 0
+
+    entries = [(email, uid) for email, uid in doc_snapshot.to_dict().items() if uid]
+    print(f"found {len(entries)} legacy entries")
+    if dry_run:
+        return len(entries)
+
+    for start in range(0, len(entries), BATCH_SIZE):
+        batch = firestore_client.batch()
+        for email, uid in entries[start:start + BATCH_SIZE]:
+            batch.set(emailIndexRef(email), {"uid": uid, "email": normalizeEmail(email)})
+        await batch.commit()
+        print(f"migrated {min(start + BATCH_SIZE, len(entries))}/{len(entries)}")
+
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only count the entries that would be migrated")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run))
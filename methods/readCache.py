@@ -0,0 +1,75 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from cachetools import TTLCache
+
+
+class ReadCache:
+    """
+    Bounded, TTL-based read-through cache for rarely changing Firestore reads.
+
+    Values expire after `ttl` seconds and the least recently used entries are
+    evicted once `maxsize` is reached. A loader returning None is remembered for
+    `negative_ttl` seconds so unknown keys (e.g. emails with no account) do not
+    hit Firestore on every request. Each worker process has its own copy, so
+    writers invalidate locally and the TTL bounds staleness across workers.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, negative_ttl: Optional[float] = None):
+        self.name = name
+        self._values = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._negative = TTLCache(maxsize=maxsize, ttl=negative_ttl) if negative_ttl else None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        read_caches[name] = self
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._values.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self._negative is not None and key in self._negative:
+            self.negative_hits += 1
+            return None
+
+        self.misses += 1
+        value = await loader()
+        self.set(key, value)
+        return value
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or None, for callers that revalidate entries themselves."""
+        value = self._values.get(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if value is None:
+            self._values.pop(key, None)
+            if self._negative is not None:
+                self._negative[key] = True
+            return
+        self._values[key] = value
+        if self._negative is not None:
+            self._negative.pop(key, None)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._values.pop(key, None)
+        if self._negative is not None:
+            self._negative.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._values),
+            "negativeSize": len(self._negative) if self._negative is not None else 0,
+            "hits": self.hits,
+            "negativeHits": self.negative_hits,
+            "misses": self.misses,
+            "hitRate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+read_caches: Dict[str, ReadCache] = {}
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import Dict, Optional
+import aiohttp
+from cachetools import TLRUCache
+from firebase_admin import auth
+from google.auth import jwt as google_jwt
+
+
+CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class FirebaseTokenVerifier:
+    """
+    Verifies Firebase ID tokens without blocking the event loop.
+
+    Google's signing certificates are fetched in the background and refreshed
+    ahead of their Cache-Control expiry, so verification is a local signature
+    check. Decoded claims are cached by token hash until the token's own `exp`.
+    If the certificates are not loaded yet, or a token is signed with a key we
+    have not seen, it falls back to firebase_admin in a worker thread.
+    """
+
+    def __init__(self, project_id: str, maxsize: int = 10000, refresh_margin: int = 300):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.refresh_margin = refresh_margin
+        self._claims = TLRUCache(maxsize=maxsize, ttu=lambda _key, claims, _now: claims["exp"], timer=time.time)
+        self._certs: Dict[str, str] = {}
+        self._certs_expire_at = 0.0
+        self._refresher: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def verify(self, id_token: str) -> dict:
+        key = hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+        claims = self._claims.get(key)
+        if claims is not None:
+            return claims
+
+        claims = self._verify_locally(id_token)
+        if claims is None:
+            claims = await asyncio.to_thread(auth.verify_id_token, id_token)
+        self._claims[key] = claims
+        return claims
+
+    def _verify_locally(self, id_token: str) -> Optional[dict]:
+        if time.time() >= self._certs_expire_at:
+            return None
+        header = google_jwt.decode_header(id_token)
+        if header.get("alg") != "RS256" or header.get("kid") not in self._certs:
+            return None
+
+        claims = google_jwt.decode(id_token, certs=self._certs, audience=self.project_id, clock_skew_in_seconds=10)
+        if claims.get("iss") != self.issuer:
+            raise ValueError(f"Firebase ID token has incorrect issuer: {claims.get('iss')}")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("Firebase ID token has an invalid subject")
+        claims["uid"] = subject
+        return claims
+
+    async def refresh_certs(self) -> float:
+        """Fetch the current signing certificates and return seconds until they expire."""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        async with self._session.get(CERTS_URL) as response:
+            response.raise_for_status()
+            certs = await response.json()
+            match = MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else 3600
+        self._certs = certs
+        self._certs_expire_at = time.time() + max_age
+        return max_age
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                max_age = await self.refresh_certs()
+                delay = max(60, max_age - self.refresh_margin)
+            except Exception as e:
+                print("failed to refresh firebase signing certificates:", e)
+                delay = 30
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
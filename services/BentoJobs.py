@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from cachetools import TTLCache
+from fastapi import HTTPException
+from services.config import env_int
+
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+
+class BentoJob:
+    """State of one background bento generation, observable while it runs."""
+
+    def __init__(self, uid: str):
+        self.id = uuid.uuid4().hex
+        self.uid = uid
+        self.status = "queued"
+        self.cards: List[dict] = []
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def update(self, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._touch()
+
+    def add_card(self, card: dict) -> None:
+        self.cards.append(card)
+        self._touch()
+
+    def _touch(self) -> None:
+        self.updated_at = time.time()
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, version: int, timeout: float) -> None:
+        if self.version != version:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "cards": list(self.cards),
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+
+
+class BentoJobManager:
+    """
+    Runs bento generations in the background with bounded concurrency.
+
+    POST returns a job id immediately; clients poll or subscribe for progress.
+    Finished jobs are kept for `ttl` seconds. Resubmitting the same input (same
+    user and same prompt hash) returns the existing job instead of paying for a
+    second generation; once the profile changes the input key changes too and a
+    new job is started. Jobs live in this process only.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 20, ttl: int = 3600, max_jobs: int = 1000):
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jobs: TTLCache = TTLCache(maxsize=max_jobs, ttl=ttl)
+        self._latest_by_input: TTLCache = TTLCache(maxsize=max_jobs, ttl=ttl)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, uid: str, generator, input_key: str, regenerate: bool = False) -> BentoJob:
+        latest_id = self._latest_by_input.get((uid, input_key))
+        latest = self._jobs.get(latest_id) if latest_id else None
+        if latest is not None and latest.status != "failed" and not (regenerate and latest.done):
+            return latest
+
+        queued = sum(1 for job in self._jobs.values() if job.status == "queued")
+        if queued >= self.max_queue:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many bento generations queued, try again shortly",
+                headers={"Retry-After": "10"},
+            )
+
+        job = BentoJob(uid)
+        self._jobs[job.id] = job
+        self._latest_by_input[(uid, input_key)] = job.id
+        task = asyncio.create_task(self._run(job, generator))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: BentoJob, generator) -> None:
+        async with self._semaphore:
+            job.update(status="running")
+            try:
+                async for card in generator.stream_bento(job.uid):
+                    job.add_card(card)
+                job.update(status="succeeded", result={"elements": list(job.cards)})
+            except asyncio.CancelledError:
+                job.update(status="failed", error="cancelled")
+                raise
+            except Exception as e:
+                print(f"bento job {job.id} failed: {e!r}")
+                job.update(status="failed", error=str(e))
+
+    def get(self, job_id: str, uid: str) -> BentoJob:
+        job = self._jobs.get(job_id)
+        if job is None or job.uid != uid:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    async def events(self, job: BentoJob, heartbeat: float = 15) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a snapshot whenever the job changes (or as a heartbeat) until it finishes."""
+        while True:
+            version = job.version
+            yield {"event": "status", "data": json.dumps(job.snapshot())}
+            if job.done:
+                return
+            await job.wait_for_change(version, heartbeat)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+bento_jobs = BentoJobManager(
+    max_concurrency=env_int("BENTO_JOB_CONCURRENCY", 2),
+    max_queue=env_int("BENTO_JOB_MAX_QUEUE", 20),
+    ttl=env_int("BENTO_JOB_TTL", 3600),
+)
@@ -0,0 +1,239 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Union
+from google.api_core.exceptions import NotFound, NotModified
+from google.cloud.storage.retry import DEFAULT_RETRY
+from services.config import env_float, env_int
+
+
+# GCS accepts up to 1000 calls per batch request but recommends staying at or below 100
+DELETE_BATCH_SIZE = 100
+
+
+@dataclass
+class StoredBlob:
+    name: str
+    url: str
+    generation: Optional[int] = None
+
+
+@dataclass
+class ListedBlob:
+    name: str
+    generation: Optional[int]
+    created: float  # Unix timestamp
+
+
+@dataclass
+class DownloadedBlob:
+    data: bytes
+    generation: Optional[int] = None
+
+
+class BlobStorage(ABC):
+    """
+    Async interface for the object storage behind icons and TeX uploads.
+
+    Implementations must never block the event loop. GcsBlobStorage is used in
+    production; LocalBlobStorage keeps everything on the local filesystem so the
+    upload paths can be exercised and benchmarked without GCS.
+    """
+
+    @abstractmethod
+    async def upload(self, name: str, data: Union[bytes, BinaryIO], content_type: Optional[str],
+                     public: bool = True, cache_control: Optional[str] = None) -> StoredBlob:
+        ...
+
+    @abstractmethod
+    async def list(self, prefix: str) -> List[ListedBlob]:
+        ...
+
+    @abstractmethod
+    async def delete(self, names: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def download(self, name: str, if_generation_not_match: Optional[int] = None) -> Optional[DownloadedBlob]:
+        """
+        Fetch an object. Returns None when it is still at `if_generation_not_match`,
+        so callers holding that generation can keep their copy. Raises FileNotFoundError
+        if the object does not exist.
+        """
+        ...
+
+    @abstractmethod
+    async def exists(self, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def public_url(self, name: str) -> str:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class GcsBlobStorage(BlobStorage):
+    """
+    Runs the synchronous google-cloud-storage client on a bounded thread pool.
+
+    All calls share one client (and so one pooled HTTP session); every request
+    gets the configured timeout and retry policy.
+    """
+
+    def __init__(self, bucket, max_workers: int = 8, timeout: float = 30, retry=DEFAULT_RETRY):
+        self.bucket = bucket
+        self.timeout = timeout
+        self.retry = retry
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs")
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def _upload(self, name, data, content_type, public, cache_control) -> StoredBlob:
+        blob = self.bucket.blob(name)
+        if cache_control:
+            blob.cache_control = cache_control
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            blob.upload_from_string(bytes(data), content_type=content_type, timeout=self.timeout, retry=self.retry)
+        else:
+            # A known size lets small files go up in one multipart request instead of a resumable session
+            data.seek(0, os.SEEK_END)
+            size = data.tell()
+            blob.upload_from_file(data, content_type=content_type, size=size, rewind=True, timeout=self.timeout, retry=self.retry)
+        if public:
+            blob.make_public(timeout=self.timeout, retry=self.retry)
+        return StoredBlob(name=name, url=blob.public_url, generation=blob.generation)
+
+    async def upload(self, name, data, content_type, public=True, cache_control=None) -> StoredBlob:
+        return await self._call(self._upload, name, data, content_type, public, cache_control)
+
+    def _list(self, prefix: str) -> List[ListedBlob]:
+        return [
+            ListedBlob(name=blob.name, generation=blob.generation, created=blob.time_created.timestamp())
+            for blob in self.bucket.list_blobs(prefix=prefix, timeout=self.timeout, retry=self.retry)
+        ]
+
+    async def list(self, prefix: str) -> List[ListedBlob]:
+        return await self._call(self._list, prefix)
+
+    def _delete(self, names: List[str]) -> None:
+        client = self.bucket.client
+        for start in range(0, len(names), DELETE_BATCH_SIZE):
+            # One HTTP round trip per chunk; objects that are already gone are not an error
+            with client.batch(raise_exception=False):
+                for name in names[start:start + DELETE_BATCH_SIZE]:
+                    self.bucket.delete_blob(name, timeout=self.timeout, retry=self.retry)
+
+    async def delete(self, names: List[str]) -> None:
+        if names:
+            await self._call(self._delete, names)
+
+    def _download(self, name: str, if_generation_not_match: Optional[int]) -> Optional[DownloadedBlob]:
+        blob = self.bucket.blob(name)
+        try:
+            data = blob.download_as_bytes(
+                if_generation_not_match=if_generation_not_match, timeout=self.timeout, retry=self.retry,
+            )
+        except NotModified:
+            return None
+        except NotFound:
+            raise FileNotFoundError(name)
+        return DownloadedBlob(data=data, generation=blob.generation)
+
+    async def download(self, name: str, if_generation_not_match: Optional[int] = None) -> Optional[DownloadedBlob]:
+        return await self._call(self._download, name, if_generation_not_match)
+
+    async def exists(self, name: str) -> bool:
+        return await self._call(self.bucket.blob(name).exists, timeout=self.timeout, retry=self.retry)
+
+    def public_url(self, name: str) -> str:
+        return self.bucket.blob(name).public_url
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class LocalBlobStorage(BlobStorage):
+    """Filesystem-backed storage for local development and benchmarks."""
+
+    def __init__(self, root: Union[str, Path], base_url: str = "http://localhost:8000/storage/"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url.rstrip("/") + "/"
+
+    def _path(self, name: str) -> Path:
+        path = (self.root / name).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid object name: {name}")
+        return path
+
+    def _upload(self, name, data) -> StoredBlob:
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            path.write_bytes(data)
+        else:
+            data.seek(0)
+            with open(path, "wb") as target:
+                while chunk := data.read(1024 * 1024):
+                    target.write(chunk)
+        return StoredBlob(name=name, url=self.base_url + name, generation=path.stat().st_mtime_ns)
+
+    async def upload(self, name, data, content_type, public=True, cache_control=None) -> StoredBlob:
+        return await asyncio.to_thread(self._upload, name, data)
+
+    def _list(self, prefix: str) -> List[ListedBlob]:
+        blobs = []
+        for path in self.root.rglob("*"):
+            if path.is_file():
+                name = path.relative_to(self.root).as_posix()
+                if name.startswith(prefix):
+                    stat = path.stat()
+                    blobs.append(ListedBlob(name=name, generation=stat.st_mtime_ns, created=stat.st_mtime))
+        return blobs
+
+    async def list(self, prefix: str) -> List[ListedBlob]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def _delete(self, names: List[str]) -> None:
+        for name in names:
+            self._path(name).unlink(missing_ok=True)
+
+    async def delete(self, names: List[str]) -> None:
+        await asyncio.to_thread(self._delete, names)
+
+    def _download(self, name: str, if_generation_not_match: Optional[int]) -> Optional[DownloadedBlob]:
+        path = self._path(name)
+        generation = path.stat().st_mtime_ns
+        if generation == if_generation_not_match:
+            return None
+        return DownloadedBlob(data=path.read_bytes(), generation=generation)
+
+    async def download(self, name: str, if_generation_not_match: Optional[int] = None) -> Optional[DownloadedBlob]:
+        return await asyncio.to_thread(self._download, name, if_generation_not_match)
+
+    async def exists(self, name: str) -> bool:
+        return await asyncio.to_thread(self._path(name).is_file)
+
+    def public_url(self, name: str) -> str:
+        return self.base_url + name
+
+
+def create_blob_storage(bucket) -> BlobStorage:
+    if os.getenv("STORAGE_BACKEND", "gcs").lower() == "local":
+        return LocalBlobStorage(
+            root=os.getenv("LOCAL_STORAGE_DIR", "local-storage"),
+            base_url=os.getenv("LOCAL_STORAGE_BASE_URL", "http://localhost:8000/storage/"),
+        )
+    return GcsBlobStorage(
+        bucket,
+        max_workers=env_int("STORAGE_MAX_WORKERS", 8),
+        timeout=env_float("STORAGE_TIMEOUT", 30),
+    )
@@ -1,11 +1,16 @@
 from agno.agent import Agent
 from agno.models.google import Gemini 
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from agno.knowledge.reader.pdf_reader import PDFReader
 import os
+import time
+import hashlib
 import warnings
+from services.SingleFlight import SingleFlight
+from services.PdfTextExtractor import PdfTextExtractor, pdf_text_extractor
+from methods.readCache import ReadCache
+from services.config import env_float, env_int
 from pydantic.json_schema import PydanticJsonSchemaWarning
 
 warnings.filterwarnings("ignore", category=PydanticJsonSchemaWarning)
@@ -47,8 +52,19 @@ class BasicUserData(BaseModel):
     projects: Optional[List[Project]] = Field(None, description="projects worked on")
 
 
+# Identical uploads analysed concurrently share one extraction and model call
+scan_flights = SingleFlight("pdfScan")
+# Results of previous scans, keyed by (uid, upload digest) so one user's upload never answers another's
+scan_cache = ReadCache(
+    "pdfScan",
+    maxsize=env_int("SCAN_CACHE_MAX_ENTRIES", 2000),
+    ttl=env_float("SCAN_CACHE_TTL", 24 * 3600),
+)
+
+
 class PDFtoInfo:
-    def __init__(self):
+    def __init__(self, extractor: PdfTextExtractor = pdf_text_extractor):
+        self.extractor = extractor
         self.agent = Agent(
             model= Gemini(
                 api_key=APIKEY,
@@ -56,12 +72,44 @@ class PDFtoInfo:
             ),
             output_schema=BasicUserData,
         )
-    async def analysePDF(self,file:any)->dict[str,Any]:
-        reader = PDFReader()
-        res = reader.read(file)
-        response = await self.agent.arun(f"analyze user data {res}")
+    async def analysePDF(self,file:any,uid:str,digest:Optional[str]=None)->Tuple[dict[str,Any],dict[str,float]]:
+        """
+        Returns the extracted BasicUserData and timings in milliseconds: extraction
+        and LLM time for a fresh scan, or lookup time when this user already
+        scanned an identical file. Pass the upload's SHA-256 as digest if it is
+        already known to skip hashing the file again.
+        """
+        started = time.perf_counter()
+        if digest is None:
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+            file.seek(0)
+            digest = digest.hexdigest()
+
+        timings = {}
+
+        async def scan():
+            data, scan_timings = await scan_flights.do(digest, lambda: self._analyse(file))
+            timings.update(scan_timings)
+            return data
+
+        data = await scan_cache.get_or_load((uid, digest), scan)
+        if not timings:
+            timings["cache"] = (time.perf_counter() - started) * 1000
+        return data, timings
+
+    async def _analyse(self,file:any)->Tuple[dict[str,Any],dict[str,float]]:
+        started = time.perf_counter()
+        text = await self.extractor.extract(file)
+        extracted = time.perf_counter()
+        response = await self.agent.arun(f"analyze user data from this resume text:\n{text}")
         data = response.content.model_dump(mode="json")
-        return data
+        timings = {
+            "extract": (extracted - started) * 1000,
+            "llm": (time.perf_counter() - extracted) * 1000,
+        }
+        return data, timings
         
 
         
@@ -0,0 +1,79 @@
+import asyncio
+import contextvars
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, List, Optional, Union
+from services.config import env_int
+
+
+# Token usage of the model calls made in the current generation, filled by an instructor hook
+current_usage: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_usage", default=None)
+
+
+def record_usage(response: Any) -> None:
+    """instructor 'completion:response' hook: add the call's token usage to the current generation."""
+    usage = current_usage.get()
+    response_usage = getattr(response, "usage", None)
+    if usage is None or response_usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        usage[field] = usage.get(field, 0) + (getattr(response_usage, field, 0) or 0)
+
+
+class GenerationDebugSink:
+    """
+    Opt-in capture of LLM generations for debugging.
+
+    Modes: "off" (default) records nothing; "memory" keeps the last `capacity`
+    generations in a ring buffer; "files" additionally writes one JSON file per
+    generation from a worker thread, so the event loop never waits on disk.
+    Each record carries the duration and token usage of the generation.
+    """
+
+    def __init__(self, mode: str = "off", directory: Union[str, Path, None] = None, capacity: int = 50):
+        self.mode = mode
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / "socially-generations")
+        self._recent: deque = deque(maxlen=capacity)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("memory", "files")
+
+    async def capture(self, kind: str, uid: str, output: Any, started_at: float, usage: Optional[dict] = None) -> None:
+        if not self.enabled:
+            return
+        record = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "uid": uid,
+            "startedAt": started_at,
+            "durationSeconds": time.time() - started_at,
+            "usage": usage,
+            "output": output,
+        }
+        self._recent.append(record)
+        if self.mode == "files":
+            try:
+                await asyncio.to_thread(self._write, record)
+            except Exception as e:
+                print(f"failed to write generation capture: {e}")
+
+    def _write(self, record: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{int(record['startedAt'] * 1000)}_{record['kind']}_{record['id']}.json"
+        path.write_text(json.dumps(record, ensure_ascii=False, default=str), encoding="utf-8")
+
+    def recent(self, uid: Optional[str] = None) -> List[dict]:
+        return [record for record in self._recent if uid is None or record["uid"] == uid]
+
+
+generation_debug_sink = GenerationDebugSink(
+    mode=os.getenv("BENTO_DEBUG_CAPTURE", "off").lower(),
+    directory=os.getenv("BENTO_DEBUG_DIR"),
+    capacity=env_int("BENTO_DEBUG_CAPACITY", 50),
+)
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import BinaryIO, List, Sequence, Tuple
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from services.config import env_int
+
+
+ALLOWED_FORMATS = {"PNG", "JPEG", "WEBP", "GIF"}
+# Bump whenever the output of process() changes so old hashed objects are not reused
+PIPELINE_VERSION = b"icons-v1"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class IconVariant:
+    size: int
+    format: str
+    content_type: str
+    data: bytes
+
+
+class IconImagePipeline:
+    """
+    Turns an uploaded image into a small set of web-ready icon variants.
+
+    Uploads are validated (byte size, decoded pixel count, allowed formats), EXIF
+    orientation is applied, and each configured size is produced as WebP plus AVIF
+    when this Pillow build supports it. Decoding and encoding run on a bounded
+    thread pool so large photos do not stall the event loop. `digest` keys the
+    output by the source's SHA-256 and the pipeline settings, so re-uploading the
+    same image maps to objects that already exist.
+    """
+
+    def __init__(self, sizes: Sequence[int] = (64, 128, 256), max_bytes: int = 10 * 1024 * 1024,
+                 max_pixels: int = 40_000_000, max_workers: int = 2, quality: int = 82):
+        self.sizes = tuple(sorted(sizes))
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.quality = quality
+        self.formats: List[Tuple[str, str]] = [("WEBP", "image/webp")]
+        if features.check("avif"):
+            self.formats.append(("AVIF", "image/avif"))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="icons")
+
+    def digest(self, source_digest: str) -> str:
+        settings = repr((self.sizes, self.formats, self.quality)).encode("utf-8")
+        return hashlib.sha256(PIPELINE_VERSION + b"\0" + settings + b"\0" + source_digest.encode("ascii")).hexdigest()
+
+    def object_name(self, digest: str, size: int, image_format: str) -> str:
+        return f"user-icons/{digest}/{size}.{image_format.lower()}"
+
+    async def process(self, file: BinaryIO) -> List[IconVariant]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._process, file))
+
+    def _process(self, file: BinaryIO) -> List[IconVariant]:
+        file.seek(0, os.SEEK_END)
+        if file.tell() > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {self.max_bytes} bytes")
+        file.seek(0)
+        try:
+            image = Image.open(file)
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=415, detail="Unsupported image type")
+        except Image.DecompressionBombError:
+            raise HTTPException(status_code=413, detail="Image dimensions are too large")
+        if image.format not in ALLOWED_FORMATS:
+            raise HTTPException(status_code=415, detail=f"Unsupported image type {image.format}")
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise HTTPException(status_code=413, detail="Image dimensions are too large")
+
+        largest = self.sizes[-1]
+        try:
+            # JPEG can decode at a reduced scale, which is much cheaper for phone photos
+            image.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P", "PA") else "RGB")
+        except (OSError, ValueError) as e:
+            raise HTTPException(status_code=422, detail=f"Could not decode image: {e}")
+
+        variants = []
+        for size in self.sizes:
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            for image_format, content_type in self.formats:
+                buffer = io.BytesIO()
+                resized.save(buffer, format=image_format, quality=self.quality)
+                variants.append(IconVariant(size=size, format=image_format, content_type=content_type, data=buffer.getvalue()))
+        return variants
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+icon_pipeline = IconImagePipeline(
+    sizes=[int(size) for size in os.getenv("ICON_SIZES", "64,128,256").split(",")],
+    max_bytes=env_int("ICON_MAX_BYTES", 10 * 1024 * 1024),
+    max_pixels=env_int("ICON_MAX_PIXELS", 40_000_000),
+    max_workers=env_int("ICON_MAX_WORKERS", 2),
+)
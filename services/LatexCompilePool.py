@@ -0,0 +1,101 @@
+import asyncio
+import os
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Union
+from fastapi import HTTPException
+from services.config import env_int
+
+
+class LatexCompilePool:
+    """
+    Bounds how many LaTeX compiles run at once without blocking the event loop.
+
+    A compile holds a slot for all of its engine passes. Callers beyond the
+    concurrency limit wait in a bounded queue; once the queue is full new
+    requests are rejected immediately with 503 and a Retry-After hint instead
+    of piling up behind long compiles.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 16, retry_after: int = 5):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="LaTeX compile queue is full, try again shortly",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self._waiting += 1
+        queued_at = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - queued_at
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        self._running += 1
+        try:
+            yield waited
+        finally:
+            self._running -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    async def run(self, cmd: List[str], cwd: Union[str, Path], timeout: float) -> subprocess.CompletedProcess:
+        """Run one engine/tool invocation as an asyncio subprocess."""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        return subprocess.CompletedProcess(
+            cmd,
+            process.returncode,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "maxConcurrency": self.max_concurrency,
+            "maxQueue": self.max_queue,
+            "running": self._running,
+            "queueDepth": self._waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avgWaitSeconds": self._total_wait / self._completed if self._completed else 0.0,
+            "maxWaitSeconds": self._max_wait,
+        }
+
+
+compile_pool = LatexCompilePool(
+    max_concurrency=env_int("LATEX_MAX_CONCURRENT_COMPILES", os.cpu_count() or 2),
+    max_queue=env_int("LATEX_MAX_QUEUED_COMPILES", 16),
+    retry_after=env_int("LATEX_QUEUE_RETRY_AFTER", 5),
+)
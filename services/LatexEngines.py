@@ -0,0 +1,97 @@
+import asyncio
+import shutil
+import subprocess
+from typing import Dict, Iterable, Optional
+
+
+SUPPORTED_ENGINES = ("pdflatex", "xelatex", "lualatex")
+
+
+class LatexEngineRegistry:
+    """
+    Shared record of which LaTeX engines are installed and working.
+
+    Discovery runs once at application startup so per-request converters can
+    check an engine with a dictionary lookup instead of spawning
+    `<engine> --version` every time.
+    """
+
+    def __init__(self):
+        self._engines: Dict[str, dict] = {}
+
+    async def discover(self, engines: Iterable[str] = SUPPORTED_ENGINES) -> Dict[str, dict]:
+        results = await asyncio.gather(*(self._probe(engine) for engine in engines))
+        for engine, info in zip(engines, results):
+            self._engines[engine] = info
+            if info["available"]:
+                print(f"✅ LaTeX engine {engine}: {info['version']}")
+            else:
+                print(f"❌ LaTeX engine {engine}: {info['error']}")
+        return self.status()
+
+    async def _probe(self, engine: str) -> dict:
+        path = shutil.which(engine)
+        if path is None:
+            return self._unavailable(engine, "not found on PATH")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                engine, "--version",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            return self._unavailable(engine, str(e), path)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), 10)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return self._unavailable(engine, "timed out during validation", path)
+        if process.returncode != 0:
+            return self._unavailable(engine, stderr.decode("utf-8", errors="replace").strip(), path)
+        return self._available(engine, stdout.decode("utf-8", errors="replace"), path)
+
+    def _probe_sync(self, engine: str) -> dict:
+        path = shutil.which(engine)
+        if path is None:
+            return self._unavailable(engine, "not found on PATH")
+        try:
+            result = subprocess.run([engine, "--version"], capture_output=True, check=True, text=True, timeout=10)
+        except OSError as e:
+            return self._unavailable(engine, str(e), path)
+        except subprocess.CalledProcessError as e:
+            return self._unavailable(engine, e.stderr.strip(), path)
+        except subprocess.TimeoutExpired:
+            return self._unavailable(engine, "timed out during validation", path)
+        return self._available(engine, result.stdout, path)
+
+    @staticmethod
+    def _available(engine: str, version_output: str, path: str) -> dict:
+        version = version_output.strip().splitlines()[0] if version_output.strip() else ""
+        return {"engine": engine, "available": True, "path": path, "version": version, "error": None}
+
+    @staticmethod
+    def _unavailable(engine: str, error: str, path: Optional[str] = None) -> dict:
+        return {"engine": engine, "available": False, "path": path, "version": None, "error": error}
+
+    def get(self, engine: str) -> dict:
+        info = self._engines.get(engine)
+        if info is None:
+            # Only reached outside the app lifespan (scripts, ad-hoc use); probe once and remember.
+            info = self._probe_sync(engine)
+            self._engines[engine] = info
+        return info
+
+    def require(self, engine: str) -> dict:
+        info = self.get(engine)
+        if not info["available"]:
+            if info["path"] is None:
+                raise RuntimeError(f"LaTeX engine '{engine}' not found. Please install a TeX distribution (like MiKTeX, TeX Live, or MacTeX).")
+            raise RuntimeError(f"LaTeX engine '{engine}' is not working properly: {info['error']}")
+        return info
+
+    def status(self) -> Dict[str, dict]:
+        return {engine: dict(info) for engine, info in self._engines.items()}
+
+
+latex_engines = LatexEngineRegistry()
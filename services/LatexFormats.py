@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set, Union
+from cachetools import TTLCache
+from fastapi import HTTPException
+from services.LatexCompilePool import LatexCompilePool, compile_pool
+from services.config import env_int
+
+
+# Engines whose formats can be dumped with mylatexformat (LuaTeX cannot dump loaded fonts)
+FORMAT_ENGINES = {"pdflatex": "pdftex"}
+BEGIN_DOCUMENT = re.compile(rb"\\begin\s*\{document\}")
+# Preambles pulling in other files are not safe to freeze, the included file may change
+LOCAL_INCLUDES = re.compile(rb"\\(?:input|include)\b")
+
+
+class LatexFormatCache:
+    """
+    Precompiled format dumps (mylatexformat-style) for frequently seen preambles.
+
+    Most of a resume compile is spent loading the same packages. Once a preamble
+    has been seen `min_hits` times a format with that preamble already loaded is
+    dumped in the background; later compiles with an identical preamble start
+    from the format and skip straight to \\begin{document}. Formats are keyed by
+    the preamble hash and a fingerprint of the TeX installation, so upgrading
+    TeX Live rebuilds them automatically.
+    """
+
+    def __init__(
+        self,
+        format_dir: Union[str, Path, None] = None,
+        min_hits: int = 2,
+        max_formats: int = 16,
+        retry_failed_after: float = 3600,
+        pool: LatexCompilePool = compile_pool,
+    ):
+        self.format_dir = Path(format_dir or Path(tempfile.gettempdir()) / "socially-latex-formats")
+        self.format_dir.mkdir(parents=True, exist_ok=True)
+        self.min_hits = min_hits
+        self.max_formats = max_formats
+        self.pool = pool
+        self._hits: "OrderedDict[str, int]" = OrderedDict()
+        self._building: Set[str] = set()
+        # Formats that failed to build or broke a compile are skipped for a while, then retried
+        self._failed: TTLCache = TTLCache(maxsize=1024, ttl=retry_failed_after)
+        self._fingerprints: Dict[str, Optional[str]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def extract_preamble(tex_source: bytes) -> Optional[bytes]:
+        match = BEGIN_DOCUMENT.search(tex_source)
+        if match is None:
+            return None
+        preamble = tex_source[:match.start()]
+        # Documents that pick their own format via a %& first line are left alone
+        if preamble.lstrip().startswith(b"%&") or LOCAL_INCLUDES.search(preamble):
+            return None
+        return preamble
+
+    async def format_for(self, tex_file: Path, work_dir: Path, latex_engine: str, engine_version: str) -> Optional[str]:
+        """
+        Return the format name to pass as -fmt for this document, linking the dump
+        into work_dir, or None if the document should be compiled normally.
+        """
+        if latex_engine not in FORMAT_ENGINES:
+            return None
+        if any(work_dir.glob("*.sty")) or any(work_dir.glob("*.cls")):
+            return None
+
+        preamble = self.extract_preamble(tex_file.read_bytes())
+        if preamble is None:
+            return None
+
+        fingerprint = await self._fingerprint(latex_engine, engine_version, work_dir)
+        if fingerprint is None:
+            return None
+
+        name = "fmt-" + hashlib.sha256(fingerprint.encode("utf-8") + b"\0" + preamble).hexdigest()[:32]
+        fmt_path = self.format_dir / f"{name}.fmt"
+        if fmt_path.exists():
+            os.utime(fmt_path)
+            link = work_dir / fmt_path.name
+            if not link.exists():
+                os.symlink(fmt_path, link)
+            return name
+
+        if name in self._building or name in self._failed:
+            return None
+
+        hits = self._hits.pop(name, 0) + 1
+        self._hits[name] = hits
+        while len(self._hits) > 1024:
+            self._hits.popitem(last=False)
+
+        if hits >= self.min_hits:
+            self._building.add(name)
+            task = asyncio.create_task(self._build(name, tex_file.read_bytes(), latex_engine))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return None
+
+    def discard(self, name: str) -> None:
+        """Forget a format that failed to compile a document."""
+        self._failed[name] = True
+        (self.format_dir / f"{name}.fmt").unlink(missing_ok=True)
+
+    async def _fingerprint(self, latex_engine: str, engine_version: str, work_dir: Path) -> Optional[str]:
+        if latex_engine in self._fingerprints:
+            return self._fingerprints[latex_engine]
+
+        fingerprint = None
+        try:
+            result = await self.pool.run(
+                ["kpsewhich", f"-engine={FORMAT_ENGINES[latex_engine]}", f"{latex_engine}.fmt", "mylatexformat.ltx"],
+                cwd=work_dir,
+                timeout=10,
+            )
+            paths = result.stdout.split() if result.returncode == 0 else []
+        except OSError:
+            paths = []
+        if len(paths) == 2:
+            parts = [engine_version]
+            for path in paths:
+                stat = os.stat(path)
+                parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+            fingerprint = "|".join(parts)
+        else:
+            print(f"precompiled formats disabled for {latex_engine}: base format or mylatexformat.ltx not found")
+
+        self._fingerprints[latex_engine] = fingerprint
+        return fingerprint
+
+    async def _build(self, name: str, tex_source: bytes, latex_engine: str) -> None:
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                temp_path = Path(temp_dir)
+                (temp_path / "preamble.tex").write_bytes(tex_source)
+                cmd = [
+                    latex_engine, "-ini", "-interaction=nonstopmode", f"-jobname={name}",
+                    f"&{latex_engine}", "mylatexformat.ltx", "preamble.tex",
+                ]
+                async with self.pool.slot():
+                    result = await self.pool.run(cmd, cwd=temp_path, timeout=120)
+
+                built = temp_path / f"{name}.fmt"
+                if result.returncode != 0 or not built.exists():
+                    print(f"format build {name} failed:\n{result.stdout[-2000:]}")
+                    self._failed[name] = True
+                    return
+
+                tmp_target = self.format_dir / f"{name}.fmt.{os.getpid()}.tmp"
+                shutil.move(str(built), tmp_target)
+                os.replace(tmp_target, self.format_dir / f"{name}.fmt")
+                self._hits.pop(name, None)
+                self._prune()
+        except HTTPException:
+            # Compile queue is full; try again on a later hit
+            pass
+        except Exception as e:
+            print(f"format build {name} failed: {e}")
+            self._failed[name] = True
+        finally:
+            self._building.discard(name)
+
+    def _prune(self) -> None:
+        formats = sorted(self.format_dir.glob("*.fmt"), key=lambda path: path.stat().st_mtime)
+        for path in formats[:-self.max_formats]:
+            path.unlink(missing_ok=True)
+
+
+format_cache = LatexFormatCache(
+    format_dir=os.getenv("LATEX_FORMAT_DIR"),
+    min_hits=env_int("LATEX_FORMAT_MIN_HITS", 2),
+    max_formats=env_int("LATEX_FORMAT_MAX", 16),
+    retry_failed_after=env_int("LATEX_FORMAT_RETRY_AFTER", 3600),
+)
@@ -1,10 +1,62 @@
 import re
-import subprocess
-import tempfile
+import asyncio
+import hashlib
 import shutil
+from dataclasses import dataclass
 from pathlib import Path
-from typing import  Union, List
+from typing import  BinaryIO, Union, List, Optional, Tuple, Iterable
 from starlette.datastructures import UploadFile
+from services.PdfCache import PdfCache, pdf_cache
+from services.LatexCompilePool import LatexCompilePool, compile_pool
+from services.LatexEngines import latex_engines
+from services.LatexFormats import LatexFormatCache, format_cache
+from services.TexWorkspacePool import TexWorkspacePool, workspace_pool
+from services.SingleFlight import SingleFlight
+from services.UploadIngestion import IngestedUpload
+
+
+# Log messages that mean another engine pass would change the output
+RERUN_PATTERNS = re.compile(
+    r"Rerun to get (?:cross-references|outlines|citations) right"
+    r"|Label\(s\) may have changed\. Rerun"
+    r"|Please (?:re)?run LaTeX"
+    r"|Table widths have changed\. Rerun LaTeX"
+    r"|\(rerunfilecheck\).*Rerun"
+    r"|Rerun LaTeX"
+)
+BIBER_PATTERN = re.compile(r"Please \(re\)run Biber")
+BIBTEX_PATTERN = re.compile(r"Please \(re\)run BibTeX")
+# Asset types that may be staged next to the document (images, bibliographies, classes, styles)
+ASSET_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.eps',
+                    '.bib', '.cls', '.sty', '.bst'}
+# Auxiliary outputs that LaTeX reads back on the next pass without warning in the log
+SECOND_PASS_OUTPUTS = ('.toc', '.lof', '.lot')
+
+
+# Identical documents compiled concurrently share one compile
+compile_flights = SingleFlight("latexCompile")
+
+
+@dataclass
+class PdfResult:
+    """
+    A compiled (or cached) PDF and how it was produced.
+
+    Small PDFs come with `data` from the cache's in-process tier. Large ones only
+    have `path` set, so they can be streamed from disk; `pdf` reads them into
+    memory on demand.
+    """
+    cache_key: str
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+    passes: int = 0
+    cached: bool = False
+
+    @property
+    def pdf(self) -> bytes:
+        if self.data is None:
+            self.data = self.path.read_bytes()
+        return self.data
 
 
 # THIS IS THE CORRECTED CLASS:
@@ -16,55 +68,133 @@ class TexToPdfConverter:
     and return the resulting PDF as bytes or save it to a file.
     """
     
-    def __init__(self, latex_engine: str = "pdflatex"):
+    def __init__(self, latex_engine: str = "pdflatex", cache: Optional[PdfCache] = pdf_cache,
+                 pool: LatexCompilePool = compile_pool, max_passes: int = 4,
+                 formats: Optional[LatexFormatCache] = format_cache,
+                 workspaces: TexWorkspacePool = workspace_pool):
         """
         Initialize the TeX to PDF converter.
         
         Args:
             latex_engine (str): LaTeX engine to use ('pdflatex', 'xelatex', 'lualatex')
+            cache (PdfCache): Cache for compiled PDFs, or None to always compile.
+            pool (LatexCompilePool): Bounds concurrent compiles and runs the engine off the event loop.
+            max_passes (int): Upper bound on engine passes when resolving references.
+            formats (LatexFormatCache): Precompiled preamble formats, or None to always load packages.
+            workspaces (TexWorkspacePool): Reusable scratch directories the engine runs in.
         """
         self.latex_engine = latex_engine
-        self._validate_latex_engine()
-    
-    def _validate_latex_engine(self) -> None:
-        """Validate that the specified LaTeX engine is available."""
-        try:
-            result = subprocess.run(
-                [self.latex_engine, "--version"],
-                capture_output=True,
-                check=True, # Use check=True for cleaner error handling
-                text=True,
-                timeout=10
-            )
-        except FileNotFoundError:
-            raise RuntimeError(f"LaTeX engine '{self.latex_engine}' not found. Please install a TeX distribution (like MiKTeX, TeX Live, or MacTeX).")
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"LaTeX engine '{self.latex_engine}' is not working properly: {e.stderr}")
-        except subprocess.TimeoutExpired:
-            raise RuntimeError(f"LaTeX engine '{self.latex_engine}' timed out during validation.")
+        self.cache = cache
+        self.pool = pool
+        self.max_passes = max_passes
+        self.formats = formats
+        self.workspaces = workspaces
+        self.engine_info = latex_engines.require(latex_engine)
     
-    async def tex_to_pdf_bytes(self, tex_input: Union[str, Path, UploadFile]) -> bytes:
+    async def tex_to_pdf_bytes(self, tex_input: Union[str, Path, UploadFile],
+                               assets: Iterable[Union[str, Path]] = ()) -> bytes:
         """
-        Convert a TeX input to PDF and return as bytes. This is the main router method.
+        Convert a TeX input to PDF and return as bytes.
         
         Args:
-            tex_input: Path to TeX file, or FastAPI UploadFile object.
+            tex_input: Path to TeX file, FastAPI UploadFile object, or an upload
+                already size-checked by ingest_upload.
+            assets: Auxiliary files (images, .bib, .sty, ...) to stage next to the document.
             
         Returns:
             bytes: The compiled PDF as bytes.
         """
+        result = await self.convert(tex_input, assets)
+        return result.pdf
+
+    async def convert(self, tex_input: Union[str, Path, UploadFile, IngestedUpload],
+                      assets: Iterable[Union[str, Path]] = ()) -> PdfResult:
+        """
+        Convert a TeX input to PDF. This is the main router method.
+        
+        Args:
+            tex_input: Path to TeX file, FastAPI UploadFile object, or an upload
+                already size-checked by ingest_upload.
+            assets: Auxiliary files to stage next to the document. Only these are
+                copied; the source directory is never scanned.
+            
+        Returns:
+            PdfResult: The PDF plus its cache key and the number of engine passes run.
+        """
         # This logic correctly routes the input to the appropriate handler
         print("is file",isinstance(tex_input, UploadFile))
         
-        if isinstance(tex_input, UploadFile):
-            return await self._compile_from_upload_file(tex_input)
+        if isinstance(tex_input, IngestedUpload):
+            self._validate_upload_file(tex_input)
+            return await self.convert_source(tex_input.file, tex_input.filename, assets, source_digest=tex_input.digest)
+        elif isinstance(tex_input, UploadFile):
+            self._validate_upload_file(tex_input)
+            tex_source = await tex_input.read()
+            filename = tex_input.filename
         else:
-            return await self._compile_from_file_path(tex_input)
-    
-    async def _compile_from_file_path(self, tex_file_path: Union[str, Path]) -> bytes:
+            tex_path = self._validate_tex_path(tex_input)
+            tex_source = tex_path.read_bytes()
+            filename = tex_path.name
+
+        return await self.convert_source(tex_source, filename, assets)
+
+    async def convert_source(self, tex_source: Union[bytes, BinaryIO], filename: str = "document.tex",
+                             assets: Iterable[Union[str, Path]] = (), source_digest: Optional[str] = None) -> PdfResult:
         """
-        Compile TeX file from a file system path. (This method is now corrected)
+        Convert in-memory TeX source to PDF without writing it anywhere but the workspace.
+        
+        Args:
+            tex_source: The document source, as bytes or a readable file.
+            source_digest: SHA-256 hex of the source; required when tex_source is a file.
+            filename: Name the document is compiled under (determines the jobname).
+            assets: Auxiliary files to stage next to the document.
+            
+        Returns:
+            PdfResult: The PDF plus its cache key and the number of engine passes run.
         """
+        asset_paths = self._validate_assets(assets)
+        if source_digest is None and not isinstance(tex_source, bytes):
+            raise ValueError("source_digest is required when the source is a file")
+        cache_key = PdfCache.make_key(
+            tex_source if source_digest is None else None, self.latex_engine, asset_paths, source_digest=source_digest,
+        )
+        if self.cache is not None:
+            cached_pdf = self.cache.get(cache_key)
+            if cached_pdf is not None:
+                return PdfResult(cache_key=cache_key, data=cached_pdf, cached=True)
+            cached_path = self.cache.path_for(cache_key)
+            if cached_path is not None:
+                cached_pdf = self.cache.load(cache_key, cached_path)
+                return PdfResult(cache_key=cache_key, path=cached_path, data=cached_pdf, cached=True)
+
+        return await compile_flights.do(
+            cache_key, lambda: self._compile_source(tex_source, filename, asset_paths, cache_key)
+        )
+
+    async def _compile_source(self, tex_source: Union[bytes, BinaryIO], filename: str,
+                              asset_paths: List[Path], cache_key: str) -> PdfResult:
+        # Stage the source before queueing for a slot: an uploaded file is closed
+        # once its request finishes, which may be before this compile starts.
+        async with self.workspaces.workspace() as work_dir:
+            tex_file = work_dir / Path(filename).name
+            if isinstance(tex_source, bytes):
+                tex_file.write_bytes(tex_source)
+            else:
+                tex_source.seek(0)
+                with open(tex_file, "wb") as target:
+                    shutil.copyfileobj(tex_source, target)
+            for asset in asset_paths:
+                shutil.copyfile(asset, work_dir / asset.name)
+
+            async with self.pool.slot():
+                pdf_path, passes = await self._compile_tex(tex_file, work_dir)
+                # Hand the PDF over before the workspace is cleaned
+                if self.cache is not None:
+                    path = self.cache.put_file(cache_key, pdf_path)
+                    return PdfResult(cache_key=cache_key, path=path, data=self.cache.get(cache_key), passes=passes)
+                return PdfResult(cache_key=cache_key, data=pdf_path.read_bytes(), passes=passes)
+
+    def _validate_tex_path(self, tex_file_path: Union[str, Path]) -> Path:
         tex_path = Path(tex_file_path)
 
         if not tex_path.exists():
@@ -73,70 +203,62 @@ class TexToPdfConverter:
         if tex_path.suffix.lower() not in ['.tex', '.latex']:
             raise ValueError(f"Input file must be a .tex or .latex file, got: {tex_path.suffix}")
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            temp_tex_file = temp_path / tex_path.name
-            shutil.copy2(tex_path, temp_tex_file)
-            
-            # Copy auxiliary files (images, styles, etc.) from the source directory
-            self._copy_auxiliary_files(tex_path.parent, temp_path)
-            
-            pdf_path = self._compile_tex(temp_tex_file, temp_path)
-            
-            with open(pdf_path, 'rb') as pdf_file:
-                return pdf_file.read()
-    
-    async def _compile_from_upload_file(self, upload_file: UploadFile) -> bytes:
-        """
-        Compile TeX file from a FastAPI UploadFile object. (This method was already correct)
-        """
+        return tex_path
+
+    def _validate_upload_file(self, upload_file: Union[UploadFile, IngestedUpload]) -> None:
         if not upload_file.filename:
             raise ValueError("UploadFile must have a filename.")
         
         filename = upload_file.filename.lower()
         if not (filename.endswith('.tex') or filename.endswith('.latex')):
             raise ValueError(f"Upload file must be a .tex or .latex file, but got: {upload_file.filename}")
-        
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            temp_tex_file = temp_path / upload_file.filename
-            
-            # Read the content from the UploadFile and write it to the temporary file
-            content = await upload_file.read()
-            with open(temp_tex_file, 'wb') as f:
-                f.write(content)
-            
-            # Note: For multipart uploads including auxiliary files (e.g., images),
-            # you would need to handle multiple files from the request here.
-            # This implementation assumes a self-contained .tex file.
-            
-            pdf_path = self._compile_tex(temp_tex_file, temp_path)
-            
-            with open(pdf_path, 'rb') as pdf_file:
-                return pdf_file.read()
-
-    def _copy_auxiliary_files(self, source_dir: Path, dest_dir: Path) -> None:
-        """Copy common auxiliary files to the temporary compilation directory."""
-        common_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.pdf', '.eps', 
-                           '.bib', '.cls', '.sty', '.bst'}
-        
-        for file_path in source_dir.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in common_extensions:
-                shutil.copy2(file_path, dest_dir / file_path.name)
     
-    def _compile_tex(self, tex_file: Path, work_dir: Path) -> Path:
+    def _validate_assets(self, assets: Iterable[Union[str, Path]]) -> List[Path]:
+        asset_paths = []
+        for asset in assets:
+            asset_path = Path(asset)
+            if not asset_path.is_file():
+                raise FileNotFoundError(f"Auxiliary file not found: {asset_path}")
+            if asset_path.suffix.lower() not in ASSET_EXTENSIONS:
+                raise ValueError(f"Unsupported auxiliary file type: {asset_path.suffix}")
+            asset_paths.append(asset_path)
+        return asset_paths
+    
+    async def _compile_tex(self, tex_file: Path, work_dir: Path) -> Tuple[Path, int]:
         """
         The core compilation logic. Runs the LaTeX engine in a temporary directory.
+
+        Only reruns the engine when the log or auxiliary files say the output is not
+        yet stable, and runs bibtex/biber when the document asks for them.
         """
-        pdf_file = tex_file.with_suffix('.pdf')
-        cmd = [self.latex_engine, "-interaction=nonstopmode", "-file-line-error", str(tex_file.name)]
+        pdf_file = work_dir / tex_file.with_suffix('.pdf').name
         
         try:
+            fmt_name = None
+            if self.formats is not None:
+                fmt_name = await self.formats.format_for(
+                    tex_file, work_dir, self.latex_engine, self.engine_info["version"]
+                )
+            cmd = self._engine_cmd(tex_file, fmt_name)
+
             # First compilation pass
-            result = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True, timeout=60)
+            result = await self.pool.run(cmd, cwd=work_dir, timeout=60)
+            passes = 1
+            max_passes = self.max_passes
+
+            if fmt_name and result.returncode != 0 and not pdf_file.exists():
+                # Retry without the precompiled preamble. The failed run still counts as a
+                # pass, but not against the document's rerun budget.
+                cmd = self._engine_cmd(tex_file, None)
+                result = await self.pool.run(cmd, cwd=work_dir, timeout=60)
+                passes += 1
+                max_passes += 1
+                if pdf_file.exists():
+                    # Only the format was at fault; documents that fail either way leave it alone
+                    self.formats.discard(fmt_name)
 
             # If compilation fails and no PDF is produced, raise an error
-            if result.returncode != 0 and not (work_dir / pdf_file.name).exists():
+            if result.returncode != 0 and not pdf_file.exists():
                 missing_packages = self._extract_missing_packages(result.stdout)
                 if missing_packages:
                     packages_str = ", ".join(missing_packages)
@@ -146,20 +268,84 @@ class TexToPdfConverter:
                         f"Full log:\n{result.stdout}"
                     )
                 raise RuntimeError(f"LaTeX compilation failed. Log:\n{result.stdout}\n{result.stderr}")
+
+            log_text = self._read_log(tex_file, work_dir, result.stdout)
+            needs_rerun = self._needs_rerun(log_text) or self._has_second_pass_outputs(tex_file, work_dir)
+
+            if await self._run_bibliography_tool(tex_file, work_dir, log_text):
+                needs_rerun = True
+
+            aux_digest = self._aux_digest(tex_file, work_dir)
+            while needs_rerun and pdf_file.exists() and passes < max_passes:
+                result = await self.pool.run(cmd, cwd=work_dir, timeout=60)
+                passes += 1
+                new_aux_digest = self._aux_digest(tex_file, work_dir)
+                needs_rerun = (
+                    self._needs_rerun(self._read_log(tex_file, work_dir, result.stdout))
+                    or new_aux_digest != aux_digest
+                )
+                aux_digest = new_aux_digest
             
-            # Run a second time to resolve references (if bibtex/biber is needed, more steps are required)
-            if (work_dir / pdf_file.name).exists():
-                subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True, timeout=60)
-            
-            final_pdf_path = work_dir / pdf_file.name
-            if not final_pdf_path.exists():
+            if not pdf_file.exists():
                 raise RuntimeError("PDF file was not generated after compilation.")
             
-            return final_pdf_path
+            return pdf_file, passes
             
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             raise RuntimeError("LaTeX compilation timed out after 60 seconds.")
 
+    def _engine_cmd(self, tex_file: Path, fmt_name: Optional[str]) -> List[str]:
+        cmd = [self.latex_engine, "-interaction=nonstopmode", "-file-line-error"]
+        if fmt_name:
+            cmd.append(f"-fmt={fmt_name}")
+        cmd.append(str(tex_file.name))
+        return cmd
+
+    async def _run_bibliography_tool(self, tex_file: Path, work_dir: Path, log_text: str) -> bool:
+        """Run biber or bibtex if the first pass requested it. Returns True if one ran."""
+        jobname = tex_file.stem
+        aux_file = work_dir / f"{jobname}.aux"
+
+        if BIBER_PATTERN.search(log_text) or (work_dir / f"{jobname}.bcf").exists():
+            tool = "biber"
+        elif BIBTEX_PATTERN.search(log_text) or (
+            aux_file.exists() and "\\bibdata{" in aux_file.read_text(errors="replace")
+        ):
+            tool = "bibtex"
+        else:
+            return False
+
+        if shutil.which(tool) is None:
+            print(f"document requests {tool} but it is not installed, skipping")
+            return False
+
+        result = await self.pool.run([tool, jobname], cwd=work_dir, timeout=60)
+        if result.returncode != 0:
+            print(f"{tool} exited with {result.returncode}:\n{result.stdout}")
+        return True
+
+    def _read_log(self, tex_file: Path, work_dir: Path, fallback: str) -> str:
+        log_file = work_dir / tex_file.with_suffix('.log').name
+        if log_file.exists():
+            return log_file.read_text(errors="replace")
+        return fallback
+
+    def _needs_rerun(self, log_text: str) -> bool:
+        return RERUN_PATTERNS.search(log_text) is not None
+
+    def _has_second_pass_outputs(self, tex_file: Path, work_dir: Path) -> bool:
+        for suffix in SECOND_PASS_OUTPUTS:
+            output = work_dir / tex_file.with_suffix(suffix).name
+            if output.exists() and output.stat().st_size > 0:
+                return True
+        return False
+
+    def _aux_digest(self, tex_file: Path, work_dir: Path) -> Optional[str]:
+        aux_file = work_dir / tex_file.with_suffix('.aux').name
+        if not aux_file.exists():
+            return None
+        return hashlib.sha256(aux_file.read_bytes()).hexdigest()
+
     def _extract_missing_packages(self, latex_output: str) -> List[str]:
         """Extract missing .sty package names from the LaTeX log."""
         missing_packages = []
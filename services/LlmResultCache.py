@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Union
+import diskcache
+from pydantic import BaseModel
+from methods.readCache import read_caches
+from services.config import env_int
+
+
+class LlmResultCache:
+    """
+    Persistent, size-bounded cache for LLM outputs.
+
+    Keys are a canonical hash of the input model, the model id and a prompt
+    version, so changing any of them produces a miss instead of a stale answer.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the cache grows past `size_limit` bytes. Backed by diskcache, so
+    results survive restarts and are shared by workers on the same machine; reads
+    and writes hit SQLite and may wait on its lock, so they run in a worker thread.
+    """
+
+    def __init__(self, name: str, directory: Union[str, Path, None] = None,
+                 size_limit: int = 256 * 1024 * 1024, ttl: int = 7 * 24 * 3600):
+        self.name = name
+        self.ttl = ttl
+        directory = directory or Path(tempfile.gettempdir()) / "socially-llm-cache" / name
+        self._cache = diskcache.Cache(str(directory), size_limit=size_limit, eviction_policy="least-recently-used")
+        self.hits = 0
+        self.misses = 0
+        read_caches[name] = self
+
+    @staticmethod
+    def make_key(payload: Union[BaseModel, dict, str], model_id: str, prompt_version: str) -> str:
+        if isinstance(payload, BaseModel):
+            payload = payload.model_dump(mode="json")
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        digest = hashlib.sha256()
+        for part in (model_id, prompt_version, canonical):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def prompt_version(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await asyncio.to_thread(self._cache.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        await asyncio.to_thread(self._cache.set, key, value, expire=self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "bytes": self._cache.volume(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self._cache.close()
+
+
+latex_result_cache = LlmResultCache(
+    "resumeLatex",
+    directory=os.getenv("LATEX_LLM_CACHE_DIR"),
+    size_limit=env_int("LATEX_LLM_CACHE_BYTES", 256 * 1024 * 1024),
+    ttl=env_int("LATEX_LLM_CACHE_TTL", 7 * 24 * 3600),
+)
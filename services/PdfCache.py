@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Union
+from services.config import env_int
+
+
+EVICTION_GRACE_SECONDS = 60
+
+
+class PdfCache:
+    """
+    Two-tier cache for compiled PDFs.
+
+    Entries are keyed by the SHA-256 of the TeX source, the engine name and any
+    staged assets, so a changed resume always maps to a new key and stale entries
+    simply age out. The in-process tier is an LRU bounded by total bytes that holds
+    PDFs up to `max_memory_entry_bytes`; larger ones are only streamed from disk.
+    The disk tier keeps one file per key and evicts the least recently used files
+    once it grows past its byte cap, sparing files hit within the last
+    EVICTION_GRACE_SECONDS so a response about to stream one does not lose it.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path, None] = None,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        max_memory_entry_bytes: int = 2 * 1024 * 1024,
+    ):
+        self.cache_dir = Path(cache_dir or Path(tempfile.gettempdir()) / "socially-pdf-cache")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entry_bytes = min(max_memory_entry_bytes, max_memory_bytes)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tex_source: Union[str, bytes, None], latex_engine: str, assets: Iterable[Path] = (),
+                 source_digest: Optional[str] = None) -> str:
+        """Pass source_digest (the SHA-256 hex of the source) instead of tex_source when it is already known."""
+        if source_digest is None:
+            if isinstance(tex_source, str):
+                tex_source = tex_source.encode("utf-8")
+            source_digest = hashlib.sha256(tex_source).hexdigest()
+        digest = hashlib.sha256()
+        digest.update(latex_engine.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source_digest.encode("ascii"))
+        for asset in sorted(assets, key=lambda path: path.name):
+            digest.update(b"\0" + asset.name.encode("utf-8") + b"\0")
+            digest.update(hashlib.sha256(asset.read_bytes()).digest())
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the PDF from the in-process tier, if present."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def path_for(self, key: str) -> Optional[Path]:
+        """Return the disk-tier file for key, if present, so it can be served without loading it."""
+        path = self._disk_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def load(self, key: str, path: Path) -> Optional[bytes]:
+        """Promote a small disk-tier PDF into the in-process tier; large ones are left to be streamed."""
+        try:
+            if path.stat().st_size > self.max_memory_entry_bytes:
+                return None
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put_file(self, key: str, source: Path) -> Path:
+        """Move a freshly compiled PDF into the disk tier (and the in-process tier if small) and return its cached path."""
+        if source.stat().st_size <= self.max_memory_entry_bytes:
+            self._remember(key, source.read_bytes())
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.move(str(source), tmp_path)
+        os.replace(tmp_path, path)
+        self._evict_disk(keep=path)
+        return path
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_entry_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self, keep: Optional[Path] = None) -> None:
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_disk_bytes:
+            return
+
+        entries.sort()
+        recent = time.time() - EVICTION_GRACE_SECONDS
+        for mtime, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            # Files hit in the last few seconds may be about to be streamed by a FileResponse
+            if path == keep or mtime > recent:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+pdf_cache = PdfCache(
+    cache_dir=os.getenv("PDF_CACHE_DIR"),
+    max_memory_bytes=env_int("PDF_CACHE_MEMORY_BYTES", 64 * 1024 * 1024),
+    max_disk_bytes=env_int("PDF_CACHE_DISK_BYTES", 512 * 1024 * 1024),
+    max_memory_entry_bytes=env_int("PDF_CACHE_MEMORY_ENTRY_BYTES", 2 * 1024 * 1024),
+)
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import re
+from typing import BinaryIO
+from fastapi import HTTPException
+from pypdf import PasswordType, PdfReader
+from services.config import env_int
+
+
+HORIZONTAL_WHITESPACE = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class PdfTextExtractor:
+    """
+    Pulls compact plain text out of an uploaded PDF for the LLM.
+
+    Extraction runs in a worker thread (at most `max_concurrency` at a time) so
+    the event loop keeps serving other requests. Uploads above `max_bytes` are
+    rejected, only the first `max_pages` pages are read, whitespace is
+    normalized, and the text is capped at `max_chars` to bound prompt size.
+    """
+
+    def __init__(self, max_pages: int = 10, max_bytes: int = 10 * 1024 * 1024,
+                 max_chars: int = 40000, max_concurrency: int = 4):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def extract(self, file: BinaryIO) -> str:
+        async with self._semaphore:
+            return await asyncio.to_thread(self._extract, file)
+
+    def _extract(self, file: BinaryIO) -> str:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(0)
+        if size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"PDF is larger than {self.max_bytes} bytes")
+
+        try:
+            reader = PdfReader(file)
+            # decrypt returns NOT_DECRYPTED rather than raising when a user password is set
+            if reader.is_encrypted and reader.decrypt("") == PasswordType.NOT_DECRYPTED:
+                raise HTTPException(status_code=422, detail="PDF is password protected")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not read PDF: {e}")
+
+        parts = []
+        total = 0
+        try:
+            for index, page in enumerate(reader.pages):
+                if index >= self.max_pages or total >= self.max_chars:
+                    break
+                text = self._normalize(page.extract_text() or "")
+                if text:
+                    parts.append(text)
+                    total += len(text)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not read PDF: {e}")
+
+        if not parts:
+            raise HTTPException(status_code=422, detail="No extractable text found in PDF")
+        return "\n\n".join(parts)[:self.max_chars]
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        lines = (HORIZONTAL_WHITESPACE.sub(" ", line).strip() for line in text.splitlines())
+        return BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+pdf_text_extractor = PdfTextExtractor(
+    max_pages=env_int("SCAN_PDF_MAX_PAGES", 10),
+    max_bytes=env_int("SCAN_PDF_MAX_BYTES", 10 * 1024 * 1024),
+    max_chars=env_int("SCAN_PDF_MAX_CHARS", 40000),
+)
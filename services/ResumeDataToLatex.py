@@ -3,7 +3,8 @@ from agno.models.google import Gemini
 from dotenv import load_dotenv
 import os
 from Prompts.ProfileToLatexPrompt import profile_to_latex_prompt
-from fastapi import UploadFile
+from interfaces.resumeData import ResumeData
+from services.LlmResultCache import LlmResultCache, latex_result_cache
 
 if os.getenv("RAILWAY_ENVIRONMENT_NAME"):
     print("loading railway config")
@@ -13,11 +14,23 @@ else:
     load_dotenv()
     APIKEY = os.getenv("APIKEY")
 
+MODEL_ID = "gemini-2.0-flash"
+PROMPT_VERSION = LlmResultCache.prompt_version(profile_to_latex_prompt)
+
 class ResumeDataToLatex:
-    def __init__(self):
+    def __init__(self, cache: LlmResultCache = latex_result_cache):
         self.agent = Agent(model=Gemini( api_key=APIKEY,
-                id="gemini-2.0-flash"),instructions=profile_to_latex_prompt, markdown=False)
+                id=MODEL_ID),instructions=profile_to_latex_prompt, markdown=False)
+        self.cache = cache
     
-    async def get_latex(self,data:UploadFile)-> str:
+    async def get_latex(self,data:ResumeData, regenerate: bool = False)-> str:
+        key = LlmResultCache.make_key(data, MODEL_ID, PROMPT_VERSION)
+        if not regenerate:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
         response = await self.agent.arun(data)
-        return response.content.replace("```latex", "").replace("```", "").strip()
\ No newline at end of file
+        latex = response.content.replace("```latex", "").replace("```", "").strip()
+        await self.cache.set(key, latex)
+        return latex
@@ -0,0 +1,61 @@
+import re
+from typing import Any
+import jinja2
+from interfaces.resumeData import ResumeData
+from Templates.ResumeLatexTemplate import resume_latex_template
+
+
+LATEX_SPECIAL_CHARACTERS = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+    "<": r"\textless{}",
+    ">": r"\textgreater{}",
+    "·": r"\textperiodcentered{}",
+}
+LATEX_SPECIAL_PATTERN = re.compile("|".join(re.escape(char) for char in LATEX_SPECIAL_CHARACTERS))
+
+
+def latex_escape(value: Any) -> str:
+    if value is None:
+        return ""
+    return LATEX_SPECIAL_PATTERN.sub(lambda match: LATEX_SPECIAL_CHARACTERS[match.group()], str(value))
+
+
+class ResumeTemplateRenderer:
+    """
+    Deterministic ResumeData -> LaTeX rendering without a model call.
+
+    The template is compiled once; every value is escaped on output through
+    Jinja's finalize hook, so the result is always compilable and renders in a
+    few milliseconds.
+    """
+
+    def __init__(self, template_source: str = resume_latex_template):
+        environment = jinja2.Environment(
+            block_start_string="((*",
+            block_end_string="*))",
+            variable_start_string="(((",
+            variable_end_string=")))",
+            comment_start_string="((#",
+            comment_end_string="#))",
+            trim_blocks=True,
+            lstrip_blocks=True,
+            autoescape=False,
+            undefined=jinja2.StrictUndefined,
+            finalize=latex_escape,
+        )
+        self.template = environment.from_string(template_source)
+
+    def render(self, data: ResumeData) -> str:
+        return self.template.render(data=data).strip() + "\n"
+
+
+resume_template_renderer = ResumeTemplateRenderer()
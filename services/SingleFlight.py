@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it runs
+    await the same task and receive the same result or exception. Nothing is
+    remembered once the task finishes, so a later call runs the work again
+    (pair it with a result cache if that is wanted). A waiter being cancelled
+    does not cancel the shared task for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _task: self._forget(key, _task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved if every waiter was cancelled before it landed
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Union
+from services.config import env_int
+
+
+class TexWorkspacePool:
+    """
+    Reusable scratch directories for LaTeX compiles.
+
+    Each compile borrows a workspace, and on return only the files that compile
+    produced are removed, so the per-compile filesystem cost stays constant
+    instead of creating and tearing down a fresh temporary directory every time.
+    """
+
+    def __init__(self, root: Union[str, Path, None] = None, max_idle: int = 4):
+        self.root = Path(root or Path(tempfile.gettempdir()) / "socially-tex-workspaces")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_idle = max_idle
+        self._idle: List[Path] = []
+        self._created = 0
+
+    @asynccontextmanager
+    async def workspace(self):
+        if self._idle:
+            path = self._idle.pop()
+        else:
+            self._created += 1
+            path = Path(tempfile.mkdtemp(prefix=f"ws{os.getpid()}-", dir=self.root))
+        try:
+            yield path
+        finally:
+            self._release(path)
+
+    def _release(self, path: Path) -> None:
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        except OSError as e:
+            print(f"dropping tex workspace {path}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return
+
+        if len(self._idle) < self.max_idle:
+            self._idle.append(path)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+workspace_pool = TexWorkspacePool(
+    root=os.getenv("TEX_WORKSPACE_DIR"),
+    max_idle=env_int("LATEX_MAX_CONCURRENT_COMPILES", os.cpu_count() or 2),
+)
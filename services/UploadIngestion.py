@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from services.config import env_int
+
+
+# Multipart bodies carry boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class IngestedUpload:
+    """A size-checked upload: the spooled file handle plus its length and SHA-256."""
+
+    file: BinaryIO
+    filename: Optional[str]
+    content_type: Optional[str]
+    size: int
+    digest: str
+
+
+def _hash_upload(file: BinaryIO, max_bytes: int) -> tuple:
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    while chunk := file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+        digest.update(chunk)
+    file.seek(0)
+    return size, digest.hexdigest()
+
+
+async def ingest_upload(file: UploadFile, max_bytes: int) -> IngestedUpload:
+    """
+    Check an upload against max_bytes and hash it in one chunked pass off the event
+    loop. The returned handle is the upload's own spooled file, so nothing is copied;
+    it is closed once the response is sent, so consume it before the request ends.
+    """
+    size, digest = await asyncio.to_thread(_hash_upload, file.file, max_bytes)
+    return IngestedUpload(file=file.file, filename=file.filename, content_type=file.content_type, size=size, digest=digest)
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects oversized upload requests before the body is parsed.
+
+    A declared Content-Length above the path's limit gets an immediate 413; chunked
+    or understated bodies are counted as they arrive and aborted with 413 once they
+    cross it. Paths without a limit pass through untouched.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = {path: limit + MULTIPART_OVERHEAD for path, limit in limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits[scope["path"]]
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": f"Request body exceeds {limit} bytes"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, so FastAPI renders it as a 413 response
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,14 +1,19 @@
 from agno.agent import Agent
 from agno.models.google import Gemini 
 from dotenv import load_dotenv
-from typing import List, Optional, Literal, Dict
+from typing import List, Optional, Literal, AsyncIterator
+import httpx
 import instructor
 from pydantic import BaseModel, Field
-from Prompts.dataToBentoPrompt import DataToBentoPrompt
-from methods.firebaseMethods import getProfileOfUser
+from Prompts.dataToBentoPrompt import DataToBentoPrompt, SectionBentoPrompt, changedSections, mergeSectionCards
+from methods.firebaseMethods import getProfileOfUser, getBentoWebsite, saveBentoForUser, getBentoSourceOfUser, saveBentoSourceForUser
 from interfaces.resumeData import ResumeData
 import os
+import time
+import hashlib
 import openai
+from services.SingleFlight import SingleFlight
+from services.GenerationDebugSink import generation_debug_sink, current_usage, record_usage
 from atomic_agents import BaseIOSchema, AtomicAgent, AgentConfig, BasicChatInputSchema
 
 
@@ -55,6 +60,9 @@ class Bento(BaseIOSchema):
     image: Optional[str] = Field(None, description="Optional image URL for the bento card")
     tags: Optional[List[str]] = Field(None, description="Tags associated with the bento card")
     stats: Optional[List[Stat]] = Field(None, description="Stats used in 'stats' layout")
+    section: Optional[Literal['profile', 'skills', 'experiences', 'projects', 'educations', 'overview']] = Field(
+        None, description="Which part of the user data the card is built from; 'overview' for cards drawing on several parts"
+    )
 
 
 class Website(BaseIOSchema):
@@ -62,34 +70,148 @@ class Website(BaseIOSchema):
     elements: List[Bento] = Field(..., description="Bentos required to build the portfolio")
 
 
+# Concurrent generations for the same prompt (double submits) share one model call
+bento_flights = SingleFlight("bentoGeneration")
+
+
 class UserBentoGenerator:
-    def __init__(self):
-        client = instructor.from_openai(
-            openai.AsyncOpenAI(
-                api_key=APIKEY,
-                base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-            ),
-            mode=instructor.Mode.JSON
+    """
+    Meant to be created once per application (see the lifespan in main.py) so the
+    OpenAI-compatible client and its keep-alive connection pool are reused.
+    """
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.openai_client = openai.AsyncOpenAI(
+            api_key=APIKEY,
+            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+            http_client=http_client,
         )
-        model = "gemini-2.0-flash"
-        self.agent = AtomicAgent[BasicChatInputSchema, Website](
-        config=AgentConfig(
-            client=client,
-            model=model,
+        self.client = instructor.from_openai(self.openai_client, mode=instructor.Mode.JSON)
+        self.client.on("completion:response", record_usage)
+        self.model = "gemini-2.0-flash"
+
+    def _new_agent(self) -> AtomicAgent:
+        # AtomicAgent keeps chat history on the instance, so each generation gets its
+        # own (cheap) agent while the underlying client is shared.
+        return AtomicAgent[BasicChatInputSchema, Website](
+            config=AgentConfig(
+                client=self.client,
+                model=self.model,
+            )
         )
-    )
+
+    async def _generate(self, kind: str, id: str, prompt: BasicChatInputSchema) -> Website:
+        """Run one structured generation and hand it to the debug sink with its timing and token usage."""
+        started_at = time.time()
+        usage = {}
+        token = current_usage.set(usage)
+        try:
+            response = await self._new_agent().run_async(prompt)
+        finally:
+            current_usage.reset(token)
+        await generation_debug_sink.capture(kind, id, response.model_dump(mode="json"), started_at, usage or None)
+        return response
+
+    async def input_key(self, id: str) -> str:
+        """Hash of the full-generation prompt for the user's current profile."""
+        data: ResumeData = await getProfileOfUser(id)
+        return hashlib.sha256(DataToBentoPrompt(data).prompt.encode("utf-8")).hexdigest()
+
+    async def stream_bento(self, id: str) -> AsyncIterator[dict]:
+        """
+        Yield each bento card as soon as the model has finished writing it.
+
+        Uses instructor's partial streaming of the same `Website` schema; a card is
+        complete once the model has started the next one, and the last card is
+        complete when the stream ends.
+        """
+        data: ResumeData = await getProfileOfUser(id)
+        started_at = time.time()
+        cards = []
+        stream = self.client.chat.completions.create_partial(
+            model=self.model,
+            messages=[{"role": "user", "content": DataToBentoPrompt(data).prompt}],
+            response_model=Website,
+        )
+
+        emitted = 0
+        elements = []
+        async for partial in stream:
+            elements = partial.elements or []
+            while emitted < len(elements) - 1:
+                card = self._complete_card(elements[emitted])
+                emitted += 1
+                if card is not None:
+                    cards.append(card)
+                    yield card
+
+        while emitted < len(elements):
+            card = self._complete_card(elements[emitted])
+            emitted += 1
+            if card is not None:
+                cards.append(card)
+                yield card
+
+        await saveBentoSourceForUser(id, data, pending=True)
+        await generation_debug_sink.capture("bento-stream", id, {"elements": cards}, started_at)
+
+    def _complete_card(self, element) -> Optional[dict]:
+        try:
+            return Bento.model_validate(element.model_dump()).model_dump(mode="json")
+        except Exception as e:
+            print(f"dropping incomplete bento card: {e}")
+            return None
+
+    async def refresh_bento(self, id: str) -> dict:
+        """
+        Bring the saved website up to date with the current profile.
+
+        Only cards built from profile sections that changed since the last
+        generation are regenerated; everything else in the saved website is kept
+        as-is. Falls back to a full generation when there is no saved website, no
+        record of the profile it was built from, or the saved cards predate
+        section tagging. Cross-cutting 'overview' cards are only rebuilt by a full
+        generation.
+        """
+        data: ResumeData = await getProfileOfUser(id)
+        saved = await getBentoWebsite(id)
+        source = await getBentoSourceOfUser(id)
+        elements = (saved or {}).get("elements") or []
+
+        if not elements or source is None or any(not element.get("section") for element in elements):
+            website = await self.get_bento(id)
+            await saveBentoForUser(id, website)
+            return website
+
+        changed = changedSections(source, data)
+        if not changed:
+            return saved
+
+        previous = [element for element in elements if element.get("section") in changed]
+        prompt = BasicChatInputSchema(chat_message=SectionBentoPrompt(data, changed, previous).prompt)
+        response = await self._generate("bento-refresh", id, prompt)
+        fresh = [
+            card.model_dump(mode="json")
+            for card in response.elements
+            if card.section in changed
+        ]
+
+        website = {**saved, "elements": mergeSectionCards(elements, fresh, changed)}
+        await saveBentoForUser(id, website)
+        await saveBentoSourceForUser(id, data)
+        return website
+
+    async def aclose(self) -> None:
+        await self.openai_client.close()
         
     async def get_bento(self , id: str):
         data: ResumeData = await getProfileOfUser(id)
         prompt = BasicChatInputSchema(chat_message=DataToBentoPrompt(data).prompt)
+        key = hashlib.sha256(prompt.chat_message.encode("utf-8")).hexdigest()
         
         try:
-            response = await self.agent.run_async(prompt)
-            print(response)
-            
-            with open("output.json", "w", encoding="utf-8") as file:
-                file.write(str(response))
-                
+            response = await bento_flights.do(key, lambda: self._generate("bento", id, prompt))
+            await saveBentoSourceForUser(id, data, pending=True)
             return response.model_dump(mode="json")
             
         except Exception as e:
@@ -0,0 +1,54 @@
+from interfaces.resumeData import Project, ResumeData
+from Prompts.dataToBentoPrompt import changedSections, mergeSectionCards
+
+
+def card(section, title):
+    return {"section": section, "title": title}
+
+
+def profile(**overrides):
+    data = {
+        "fullName": "Ada Lovelace",
+        "title": "Engineer",
+        "summary": "Writes programs",
+        "skills": ["python"],
+        "educations": [],
+        "projects": [],
+        "experiences": [],
+    }
+    data.update(overrides)
+    return ResumeData(**data)
+
+
+def test_changed_sections_reports_only_differing_fields():
+    before = profile()
+    after = profile(skills=["python", "go"], title="Staff Engineer")
+    assert changedSections(before, after) == {"skills", "profile"}
+    assert changedSections(before, profile()) == set()
+
+
+def test_changed_sections_detects_nested_changes():
+    project = Project(name="Engine", techstack=["c"], year="1843", summary="Notes")
+    edited = Project(name="Engine", techstack=["c"], year="1843", summary="Longer notes")
+    assert changedSections(profile(projects=[project]), profile(projects=[edited])) == {"projects"}
+
+
+def test_fresh_cards_take_the_position_of_the_first_old_card():
+    elements = [card("profile", "hero"), card("skills", "old a"), card("projects", "p"), card("skills", "old b")]
+    fresh = [card("skills", "new a"), card("skills", "new b")]
+    merged = mergeSectionCards(elements, fresh, {"skills"})
+    assert [element["title"] for element in merged] == ["hero", "new a", "new b", "p"]
+
+
+def test_changed_section_without_fresh_cards_keeps_old_cards():
+    elements = [card("profile", "hero"), card("skills", "old"), card("projects", "p")]
+    fresh = [card("projects", "new p")]
+    merged = mergeSectionCards(elements, fresh, {"skills", "projects"})
+    assert [element["title"] for element in merged] == ["hero", "old", "new p"]
+
+
+def test_cards_for_new_sections_are_appended():
+    elements = [card("profile", "hero")]
+    fresh = [card("educations", "degree")]
+    merged = mergeSectionCards(elements, fresh, {"educations"})
+    assert [element["title"] for element in merged] == ["hero", "degree"]
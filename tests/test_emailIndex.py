@@ -0,0 +1,28 @@
+from methods.emailIndex import emailIndexKey, legacyUidFromSnapshot, normalizeEmail
+
+
+class Snapshot:
+    def __init__(self, data, exists=True):
+        self._data = data
+        self.exists = exists
+
+    def to_dict(self):
+        return self._data
+
+
+def test_unknown_email_in_legacy_map_returns_none():
+    # A field-masked read of an existing map doc that lacks the email comes back empty
+    assert legacyUidFromSnapshot(Snapshot({}), "nobody@example.com") is None
+
+
+def test_missing_legacy_map_returns_none():
+    assert legacyUidFromSnapshot(Snapshot(None, exists=False), "nobody@example.com") is None
+
+
+def test_known_email_in_legacy_map_returns_uid():
+    assert legacyUidFromSnapshot(Snapshot({"a.b@example.com": "uid-1"}), "a.b@example.com") == "uid-1"
+
+
+def test_index_key_ignores_case_and_whitespace():
+    assert normalizeEmail("  A@Example.com ") == "a@example.com"
+    assert emailIndexKey("  A@Example.com ") == emailIndexKey("a@example.com")